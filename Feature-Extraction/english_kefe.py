@@ -17,6 +17,7 @@ from transformers import BertConfig, TFBertModel
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import precision_recall_fscore_support
 import statsmodels.api as sm
+from normalize import text_hash
 
 # Make sure necessary dependencies are downloaded
 try:
@@ -379,20 +380,22 @@ class ReviewMatcher:
         """
         feature_review_map = defaultdict(list)
         
-        # Process each review once
-        processed_reviews = []
+        # Process each distinct review text once, keyed by its content hash
+        processed_reviews = {}
         for review_data in reviews:
             review_text = review_data.get('text', '')
             if not review_text:
                 continue
                 
-            # Clean the review
-            processed_text = self.preprocess_review(review_text)
-            processed_review = {
-                'processed_text': processed_text,
-                'original': review_data  # Keep original data for reference
-            }
-            processed_reviews.append(processed_review)
+            content_hash = text_hash(review_text)
+            if content_hash not in processed_reviews:
+                # Clean the review
+                processed_reviews[content_hash] = {
+                    'processed_text': self.preprocess_review(review_text),
+                    'originals': []  # Every review with this text
+                }
+            processed_reviews[content_hash]['originals'].append(review_data)
+        processed_reviews = list(processed_reviews.values())
         
         # For each feature, find matching reviews
         for feature in features:
@@ -420,13 +423,13 @@ class ReviewMatcher:
                     prediction = np.argmax(logits)
                     
                     if prediction == 1:  # Feature is mentioned in review
-                        matched_reviews.append(review['original'])
+                        matched_reviews.extend(review['originals'])
             else:
                 # Use basic matching 
                 for review in processed_reviews:
                     is_matched = self.basic_feature_matching(feature, review['processed_text'])
                     if is_matched:
-                        matched_reviews.append(review['original'])
+                        matched_reviews.extend(review['originals'])
             
             feature_review_map[feature] = matched_reviews
         
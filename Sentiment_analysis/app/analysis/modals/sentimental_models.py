@@ -16,3 +16,17 @@ class ReviewSentiment(SQLModel, table=True):
     neutral_score: float
     positive_score: float
     done_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class TextAnalysis(SQLModel, table=True):
+    # one analysis per distinct normalised review text, see analysis/normalize.py
+    __tablename__ = "review_text_analyses"
+    content_hash: str = Field(primary_key=True, max_length=64)
+    sentiment: str
+    confidence: float
+    rating_estimate: float
+    category: str
+    negative_score: float
+    neutral_score: float
+    positive_score: float
+    done_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,21 @@
+import hashlib
+import re
+import unicodedata
+from typing import Optional
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# keep in step with Spiders/load/normalize.py, the loader sends these hashes
+def normalize_content(text: Optional[str]) -> str:
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def text_hash(text: Optional[str]) -> Optional[str]:
+    normalized = normalize_content(text)
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
@@ -1,11 +1,12 @@
 from pydantic import BaseModel, Field
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 
 class AppReviewSchema(BaseModel):
     review_id: UUID
     review_text: str
+    content_hash: Optional[str] = None
 
 
 class AppReviewList(BaseModel):
@@ -1,8 +1,12 @@
 from celery import Celery
+from app.analysis.normalize import text_hash
 from app.analysis.sentimental_analysis import analyze_sentiment
-from app.analysis.models.sentimental_models import ReviewSentiment
-from sqlmodel import create_engine, Session, SQLModel
+from app.analysis.models.sentimental_models import ReviewSentiment, TextAnalysis
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import create_engine, Session, SQLModel, select
 import os
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -23,47 +27,100 @@ celery_app = Celery(
 # celery_app.conf.update(result_expires=300)
 
 
+def text_analysis(content_hash, sentiment: dict) -> TextAnalysis:
+    raw_scores = sentiment.get("raw_scores", {})
+    return TextAnalysis(
+        content_hash=content_hash,
+        sentiment=sentiment.get("sentiment"),
+        confidence=sentiment.get("confidence"),
+        rating_estimate=sentiment.get("rating_estimate"),
+        category=sentiment.get("category"),
+        negative_score=raw_scores.get("negative"),
+        neutral_score=raw_scores.get("neutral"),
+        positive_score=raw_scores.get("positive"),
+    )
+
+
+def analyses_by_hash(session: Session, texts: dict) -> dict:
+    """An analysis for every ``content_hash -> text`` of ``texts``.
+
+    Texts analysed before, by any task, are read from review_text_analyses;
+    the rest go through the model once each and are added to it.
+    """
+    hashes = [content_hash for content_hash in texts if content_hash is not None]
+    known = {
+        analysis.content_hash: analysis
+        for analysis in session.exec(
+            select(TextAnalysis).where(TextAnalysis.content_hash.in_(hashes))
+        )
+    }
+    new = []
+    for content_hash, text in texts.items():
+        if content_hash not in known:
+            known[content_hash] = text_analysis(content_hash, analyze_sentiment(text))
+            if content_hash is not None:
+                new.append(known[content_hash])
+    if new:
+        # another worker may have analysed the same text meanwhile
+        session.execute(
+            insert(TextAnalysis)
+            .values([analysis.model_dump() for analysis in new])
+            .on_conflict_do_nothing(index_elements=["content_hash"])
+        )
+    return known
+
+
 @celery_app.task(name="tasks.analyze_reviews_bulk")
 def analyze_reviews_bulk(reviews: list):
     sentiment_records = []
     summary_results = []
 
+    texts = {}
+    for review in reviews:
+        review["content_hash"] = review.get("content_hash") or text_hash(
+            review.get("review_text")
+        )
+        texts.setdefault(review["content_hash"], review.get("review_text"))
+
     with Session(engine) as session:
+        analyses = analyses_by_hash(session, texts)
         for review in reviews:
-            sentiment = analyze_sentiment(review.get("review_text"))
+            analysis = analyses[review["content_hash"]]
 
             sentiment_record = ReviewSentiment(
                 review_id=review.get("review_id"),  # Use .get() for safety
-                sentiment=sentiment.get("sentiment"),
-                confidence=sentiment.get("confidence"),
-                rating_estimate=sentiment.get("rating_estimate"),
-                category=sentiment.get("category"),
-                negative_score=sentiment.get("raw_scores", {}).get(
-                    "negative"
-                ),  # Safe access
-                positive_score=sentiment.get("raw_scores", {}).get(
-                    "positive"
-                ),  # Safe access
-                neutral_score=sentiment.get("raw_scores", {}).get(
-                    "neutral"
-                ),  # Safe access
-                # Remove done_at to use model default, or keep if analyze_sentiment provides it
+                sentiment=analysis.sentiment,
+                confidence=analysis.confidence,
+                rating_estimate=analysis.rating_estimate,
+                category=analysis.category,
+                negative_score=analysis.negative_score,
+                positive_score=analysis.positive_score,
+                neutral_score=analysis.neutral_score,
             )
             sentiment_records.append(sentiment_record)
 
             summary_results.append(
                 {
                     "review_id": review.get("review_id"),  # Consistent with above
-                    "sentiment": sentiment.get("sentiment"),
-                    "confidence": sentiment.get("confidence"),
+                    "sentiment": analysis.sentiment,
+                    "confidence": analysis.confidence,
                 }
             )
 
+        # an edited review is sent again, its new score replaces the old one
+        session.execute(
+            delete(ReviewSentiment).where(
+                ReviewSentiment.review_id.in_(
+                    [uuid.UUID(str(review.get("review_id"))) for review in reviews]
+                )
+            )
+        )
         session.add_all(sentiment_records)
         session.commit()
 
     return {
         "Status": "Success",
         "Analyzed": len(sentiment_records),
+        "Distinct": len(texts),
         "Results": summary_results,
     }
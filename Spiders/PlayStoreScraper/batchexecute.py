@@ -0,0 +1,74 @@
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib decoder is used without it
+    orjson = None
+
+RESPONSE_PREFIX = ")]}'"
+_WHITESPACE = " \t\r\n"
+_json_decoder = json.JSONDecoder()
+
+
+def _payload_offset(body: Union[str, bytes]) -> int:
+    """Index of the first JSON character after the ``)]}'`` guard prefix."""
+    if isinstance(body, str):
+        prefix, whitespace = RESPONSE_PREFIX, _WHITESPACE
+    else:
+        prefix, whitespace = RESPONSE_PREFIX.encode(), _WHITESPACE.encode()
+    offset = len(prefix) if body.startswith(prefix) else 0
+    end = len(body)
+    while offset < end and body[offset : offset + 1] in whitespace:
+        offset += 1
+    if offset == end:
+        raise ValueError("Empty batchexecute response")
+    return offset
+
+
+def loads(data: Union[str, bytes, memoryview], use_orjson: Optional[bool] = None):
+    if use_orjson is None:
+        use_orjson = orjson is not None
+    if use_orjson:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+def loads_envelope(body: Union[str, bytes], use_orjson: Optional[bool] = None) -> Any:
+    """Decode the outer batchexecute envelope without copying the body.
+
+    The guard prefix is skipped by offset: orjson reads a memoryview over the
+    bytes and the stdlib decoder starts ``raw_decode`` at the offset.
+    """
+    offset = _payload_offset(body)
+    if use_orjson is None:
+        use_orjson = orjson is not None
+    if use_orjson:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return orjson.loads(memoryview(body)[offset:])
+    if not isinstance(body, str):
+        body = body.decode("utf-8")
+    return _json_decoder.raw_decode(body, offset)[0]
+
+
+def parse_reviews_response(
+    body: Union[str, bytes], use_orjson: Optional[bool] = None
+) -> Tuple[List[list], Optional[Any]]:
+    """Return the raw review rows and the pagination token of a reviews page.
+
+    The inner ``oCPfdb`` payload is decoded exactly once for both.
+    """
+    envelope = loads_envelope(body, use_orjson)
+    payload = loads(envelope[0][2], use_orjson)
+    try:
+        token = payload[-2][-1]
+    except (IndexError, KeyError, TypeError):
+        token = None
+    if len(payload) == 0 or not payload[0]:
+        return [], token
+    return payload[0], token
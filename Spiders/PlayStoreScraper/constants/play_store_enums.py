@@ -5,3 +5,10 @@ class Sort(Enum):
     MOST_RELEVANT = 1
     NEWEST = 2
     RATING = 3
+
+
+class CacheMode(Enum):
+    OFF = "off"
+    DETAILS = "details"  # serve and record fresh details pages
+    RECORD = "record"  # as DETAILS, and record every response for a replay
+    REPLAY = "replay"  # serve recorded responses only, never touch the network
@@ -0,0 +1,298 @@
+import asyncio
+import contextlib
+import inspect
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from Spiders.PlayStoreScraper.constants import play_store_enums
+from Spiders.PlayStoreScraper.play_store_scraper import (MAX_COUNT_EACH_FETCH,
+                                                         ContinuationToken,
+                                                         PlayStoreReviews)
+from Spiders.PlayStoreScraper.throttle import AdaptivePageSizer
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_PAGE_TIMEOUT = 120
+DEFAULT_PAGE_RETRIES = 3
+DEFAULT_RETRY_DELAY = 5
+SCORE_SHARDS = (1, 2, 3, 4, 5)
+
+
+@dataclass(frozen=True)
+class CrawlJob:
+    app_id: str
+    lang: str = "en"
+    country: str = "us"
+    sort: play_store_enums.Sort = play_store_enums.Sort.NEWEST
+    max_reviews: Optional[int] = None  # stop after this many reviews
+    filter_score_with: Optional[int] = None
+    filter_device_with: Optional[int] = None
+
+
+def shard_job(
+    job: CrawlJob,
+    scores: Sequence[Optional[int]] = SCORE_SHARDS,
+    devices: Sequence[Optional[int]] = (None,),
+) -> List[CrawlJob]:
+    """Split ``job`` into one continuation chain per score and device filter."""
+    return [
+        replace(job, filter_score_with=score, filter_device_with=device)
+        for score in scores
+        for device in devices
+    ]
+
+
+@dataclass
+class CrawlProgress:
+    job: CrawlJob
+    pages: int = 0
+    reviews: int = 0
+    retries: int = 0
+    done: bool = False
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def reviews_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.reviews / elapsed if elapsed else 0.0
+
+
+@dataclass
+class _JobState:
+    progress: CrawlProgress
+    # shared by the shards of one app, see crawl_sharded
+    semaphore: Optional[asyncio.Semaphore] = None
+    token: Optional[ContinuationToken] = None
+    page_sizer: Optional[AdaptivePageSizer] = None
+
+
+def _review_key(review_id: str):
+    # 16 raw bytes instead of a 36 character string per remembered review
+    try:
+        return UUID(review_id).bytes
+    except (TypeError, ValueError):
+        return review_id
+
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class ReviewCrawler:
+    """Crawls reviews for many (app_id, lang, country) jobs concurrently.
+
+    ``max_concurrency`` caps the page requests in flight across all jobs. A
+    job is one continuation chain whose every page needs the token of the
+    one before, so it never has more than one request in flight; a large
+    app is crawled in parallel with :meth:`crawl_sharded`. A slot is only
+    held while one page is fetched, so a job that is backing off or waiting
+    on its consumer never blocks the others. Pages are streamed through
+    ``on_page`` as they arrive and are not kept by the crawler.
+    """
+
+    def __init__(
+        self,
+        reviews: Optional[PlayStoreReviews] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        page_size: int = MAX_COUNT_EACH_FETCH,
+        page_timeout: float = DEFAULT_PAGE_TIMEOUT,
+        page_retries: int = DEFAULT_PAGE_RETRIES,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        adaptive_page_size: bool = True,
+    ):
+        self.reviews = reviews or PlayStoreReviews()
+        self.max_concurrency = max_concurrency
+        self.page_size = min(page_size, MAX_COUNT_EACH_FETCH)
+        self.page_timeout = page_timeout
+        self.page_retries = page_retries
+        self.retry_delay = retry_delay
+        self.adaptive_page_size = adaptive_page_size
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+
+    async def crawl(
+        self,
+        jobs: Iterable[CrawlJob],
+        on_page: Optional[Callable] = None,
+        on_progress: Optional[Callable] = None,
+    ) -> List[CrawlProgress]:
+        """Run every job and return their final progress.
+
+        ``on_page(job, reviews, token)`` receives each fetched page and
+        ``on_progress(progress)`` is called after every page and when a job
+        finishes; both may be plain functions or coroutines.
+        """
+        states = [_JobState(CrawlProgress(job)) for job in jobs]
+        return await self._run_states(states, on_page, on_progress)
+
+    async def crawl_sharded(
+        self,
+        job: CrawlJob,
+        scores: Sequence[Optional[int]] = SCORE_SHARDS,
+        devices: Sequence[Optional[int]] = (None,),
+        on_page: Optional[Callable] = None,
+        on_progress: Optional[Callable] = None,
+        concurrency: Optional[int] = None,
+    ) -> List[CrawlProgress]:
+        """Crawl one large app as parallel score x device continuation chains.
+
+        Shards share one semaphore of ``concurrency`` slots (one per shard by
+        default) on top of the global cap. Distinct score filters split the
+        reviews into disjoint shards; when shards can overlap (several device
+        filters, or an unfiltered score shard) pages reach ``on_page`` with
+        reviews already returned by another shard removed, so the merged
+        stream holds each ``review_id`` once.
+        """
+        shards = shard_job(job, scores, devices)
+        semaphore = asyncio.Semaphore(concurrency or len(shards))
+        states = [_JobState(CrawlProgress(shard), semaphore) for shard in shards]
+        disjoint = (
+            len(devices) == 1
+            and None not in scores
+            and len(set(scores)) == len(scores)
+        )
+        if disjoint:
+            return await self._run_states(states, on_page, on_progress)
+        seen = set()
+
+        def dedupe(shard, reviews, token):
+            unique = []
+            for review in reviews:
+                key = _review_key(review.review_id)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(review)
+            if on_page is not None:
+                return on_page(shard, unique, token)
+
+        return await self._run_states(states, dedupe, on_progress)
+
+    async def _run_states(self, states, on_page, on_progress) -> List[CrawlProgress]:
+        if self.adaptive_page_size:
+            # each chain adapts on its own, page_size is the ceiling
+            for state in states:
+                state.page_sizer = AdaptivePageSizer(
+                    initial=min(1000, self.page_size), maximum=self.page_size
+                )
+        await asyncio.gather(
+            *(self._run_job(state, on_page, on_progress) for state in states)
+        )
+        return [state.progress for state in states]
+
+    def _pages(self, state: _JobState):
+        job = state.progress.job
+        return self.reviews.aiter_pages(
+            job.app_id,
+            job.lang,
+            job.country,
+            job.sort,
+            count=self.page_size,
+            filter_score_with=job.filter_score_with,
+            filter_device_with=job.filter_device_with,
+            continuation_token=state.token,
+            page_sizer=state.page_sizer,
+        )
+
+    def _slots(self) -> asyncio.Semaphore:
+        # shared by every crawl running on this loop, a new loop gets its own
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _next_page(self, state: _JobState, pages):
+        shards = state.semaphore or contextlib.nullcontext()
+        async with shards, self._slots():
+            return await asyncio.wait_for(pages.__anext__(), timeout=self.page_timeout)
+
+    async def _run_job(self, state: _JobState, on_page, on_progress):
+        progress = state.progress
+        job = progress.job
+        progress.started_at = time.monotonic()
+        failures = 0
+        pages = None
+        try:
+            while True:
+                if pages is None:
+                    # (re)start the continuation chain from the last good token
+                    pages = self._pages(state)
+                try:
+                    reviews, state.token = await self._next_page(state, pages)
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    await pages.aclose()
+                    pages = None
+                    failures += 1
+                    progress.retries += 1
+                    if failures > self.page_retries:
+                        raise
+                    logging.warning(
+                        f"{job.app_id} ({job.country}) page failed: {e!r}, "
+                        f"retry {failures}/{self.page_retries}"
+                    )
+                    await asyncio.sleep(self.retry_delay * failures)
+                    continue
+                failures = 0
+                if job.max_reviews is not None:
+                    reviews = reviews[: job.max_reviews - progress.reviews]
+                progress.pages += 1
+                progress.reviews += len(reviews)
+                if on_page is not None:
+                    await _maybe_await(on_page(job, reviews, state.token))
+                if on_progress is not None:
+                    await _maybe_await(on_progress(progress))
+                if job.max_reviews is not None and progress.reviews >= job.max_reviews:
+                    break
+        except Exception as e:
+            progress.error = repr(e)
+            logging.error(f"Crawl of {job.app_id} ({job.country}) failed: {e!r}")
+        else:
+            progress.done = True
+        finally:
+            if pages is not None:
+                await pages.aclose()
+            progress.finished_at = time.monotonic()
+            logging.info(
+                f"{job.app_id} ({job.country}): {progress.reviews} reviews in "
+                f"{progress.pages} pages, {progress.reviews_per_second:.1f} reviews/s"
+            )
+            if on_progress is not None:
+                await _maybe_await(on_progress(progress))
+        return progress
+
+
+async def crawl_reviews_sharded(
+    app_id: str,
+    lang: str = "en",
+    country: str = "us",
+    on_page: Optional[Callable] = None,
+    scores: Sequence[Optional[int]] = SCORE_SHARDS,
+    devices: Sequence[Optional[int]] = (None,),
+    **kwargs,
+) -> List[CrawlProgress]:
+    """Full-history crawl of one app split into parallel filter shards."""
+    return await ReviewCrawler(**kwargs).crawl_sharded(
+        CrawlJob(app_id, lang, country), scores, devices, on_page=on_page
+    )
+
+
+async def crawl_reviews(
+    jobs: Iterable, on_page: Optional[Callable] = None, **kwargs
+) -> List[CrawlProgress]:
+    """Crawl ``(app_id, lang, country)`` tuples or :class:`CrawlJob` objects."""
+    jobs = [job if isinstance(job, CrawlJob) else CrawlJob(*job) for job in jobs]
+    return await ReviewCrawler(**kwargs).crawl(jobs, on_page=on_page)
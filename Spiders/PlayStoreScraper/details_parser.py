@@ -0,0 +1,80 @@
+import json
+from collections.abc import Mapping
+from typing import Dict, FrozenSet, Iterable
+
+from Spiders.PlayStoreScraper.constants import play_store_elements as elements
+
+CALLBACK_MARKER = "AF_initDataCallback("
+KEY_MARKER = "key: '"
+DATA_MARKER = "data:"
+DETAIL_DS_KEYS: FrozenSet[str] = frozenset(
+    f"ds:{spec.ds_num}"
+    for spec in elements.ElementSpecs.Detail.values()
+    if spec.ds_num is not None
+)
+_json_decoder = json.JSONDecoder()
+_MISSING = object()
+
+
+def locate_blocks(html: str, keys: Iterable[str]) -> Dict[str, int]:
+    """Map each wanted ``ds:`` key to the offset where its data starts.
+
+    Only ``str.find`` is used, so nothing is copied or decoded and the scan
+    stops as soon as every wanted key has been seen.
+    """
+    wanted = set(keys)
+    offsets = {}
+    position = html.find(CALLBACK_MARKER)
+    while position != -1 and wanted:
+        next_position = html.find(CALLBACK_MARKER, position + len(CALLBACK_MARKER))
+        end = len(html) if next_position == -1 else next_position
+        key_start = html.find(KEY_MARKER, position, end)
+        if key_start != -1:
+            key_start += len(KEY_MARKER)
+            key = html[key_start : html.find("'", key_start, end)]
+            if key in wanted:
+                data_start = html.find(DATA_MARKER, key_start, end)
+                if data_start != -1:
+                    data_start += len(DATA_MARKER)
+                    while data_start < end and html[data_start] in " \t\r\n":
+                        data_start += 1
+                    offsets[key] = data_start
+                    wanted.discard(key)
+        position = next_position
+    return offsets
+
+
+class LazyDetailsDataset(Mapping):
+    """``ds:`` blocks of a details page, decoded on first access.
+
+    Drop-in for the dict ``PlayStoreAppDetails.app`` used to build from every
+    ``AF_initDataCallback`` block; only ``keys`` are located and each is
+    decoded at most once.
+    """
+
+    def __init__(self, html: str, keys: Iterable[str] = DETAIL_DS_KEYS):
+        self._html = html
+        self._offsets = locate_blocks(html, keys)
+        self._cache = {}
+
+    def __getitem__(self, key: str):
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING:
+            offset = self._offsets[key]
+            try:
+                value = _json_decoder.raw_decode(self._html, offset)[0]
+            except ValueError:
+                # an undecodable block behaves like a missing one
+                del self._offsets[key]
+                raise KeyError(key)
+            self._cache[key] = value
+            if len(self._cache) == len(self._offsets):
+                # every located block is decoded, the page text can go
+                self._html = None
+        return value
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+from Spiders.PlayStoreScraper.constants.play_store_enums import CacheMode
+
+DEFAULT_DETAILS_TTL = 24 * 60 * 60  # seconds
+
+
+class CacheMiss(Exception):
+    pass
+
+
+@dataclass
+class CacheEntry:
+    content: bytes
+    meta: dict = field(default_factory=dict)
+
+
+class HttpCache:
+    """Gzipped on-disk record of Play Store responses.
+
+    Entries are keyed by method, URL and a hash of the request body. Each file
+    holds one JSON metadata line followed by the raw response body; the
+    metadata also keeps how the request went (latency, throttles), so a
+    replay feeds the adaptive page sizer what the recording saw.
+
+    Review pages are only written in ``RECORD`` mode, to be replayed later;
+    ``DETAILS`` keeps nothing but details pages.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        mode: CacheMode = CacheMode.DETAILS,
+        details_ttl: Optional[float] = DEFAULT_DETAILS_TTL,
+    ):
+        self.directory = Path(directory)
+        self.mode = mode
+        self.details_ttl = details_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(method: str, url: str, body: Union[str, bytes, None] = None) -> str:
+        if isinstance(body, str):
+            body = body.encode()
+        body_hash = hashlib.sha256(body or b"").hexdigest()
+        return hashlib.sha256(f"{method} {url} {body_hash}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.gz"
+
+    def lookup(
+        self,
+        method: str,
+        url: str,
+        body: Union[str, bytes, None] = None,
+        ttl: Optional[float] = None,
+    ) -> Optional[CacheEntry]:
+        """The recorded entry, or None when missing, unreadable or past ``ttl``."""
+        path = self._path(self.key(method, url, body))
+        try:
+            if ttl is not None and time.time() - path.stat().st_mtime > ttl:
+                self.misses += 1
+                return None
+            with gzip.open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                content = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (EOFError, gzip.BadGzipFile, ValueError, zlib.error):
+            # cut short or corrupted on disk, recorded again on the next fetch
+            self.misses += 1
+            path.unlink(missing_ok=True)
+            return None
+        self.hits += 1
+        return CacheEntry(content, meta)
+
+    def store(
+        self,
+        method: str,
+        url: str,
+        body: Union[str, bytes, None],
+        content: bytes,
+        meta: Optional[dict] = None,
+    ):
+        path = self._path(self.key(method, url, body))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            **(meta or {}),
+            "method": method,
+            "url": url,
+            "recorded_at": time.time(),
+        }
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(json.dumps(meta).encode() + b"\n")
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def cached(
+        self, method: str, url: str, body: Union[str, bytes, None] = None
+    ) -> Optional[CacheEntry]:
+        """The recorded entry to serve instead of the network, if any."""
+        if self.mode is CacheMode.OFF:
+            return None
+        if self.mode is CacheMode.REPLAY:
+            entry = self.lookup(method, url, body)
+            if entry is None:
+                raise CacheMiss(f"No recorded response for {method} {url}")
+            return entry
+        # batchexecute pages move with new reviews, only details pages are
+        # served from the recording while they are fresh
+        if method == "GET":
+            return self.lookup(method, url, body, ttl=self.details_ttl)
+        return None
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        body: Union[str, bytes, None],
+        content: bytes,
+        meta: Optional[dict] = None,
+    ):
+        if self.mode is CacheMode.RECORD or (
+            self.mode is CacheMode.DETAILS and method == "GET"
+        ):
+            self.store(method, url, body, content, meta)
+
+
+def get_default_cache() -> Optional[HttpCache]:
+    """A cache configured by ``PLAY_STORE_CACHE_DIR``/``PLAY_STORE_CACHE_MODE``."""
+    directory = os.getenv("PLAY_STORE_CACHE_DIR")
+    if not directory:
+        return None
+    mode = CacheMode(os.getenv("PLAY_STORE_CACHE_MODE", CacheMode.DETAILS.value))
+    ttl = os.getenv("PLAY_STORE_CACHE_DETAILS_TTL")
+    return HttpCache(
+        directory, mode, float(ttl) if ttl is not None else DEFAULT_DETAILS_TTL
+    )
@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+REQUEST_SECONDS = "play_store_request_seconds"
+RATE_LIMIT_WAIT_SECONDS = "play_store_rate_limit_wait_seconds"
+RESPONSE_BYTES = "play_store_response_bytes_total"
+RETRIES = "play_store_retries_total"
+BACKOFF_SECONDS = "play_store_backoff_seconds"
+THROTTLES = "play_store_gateway_throttles_total"
+REQUEST_ERRORS = "play_store_request_errors_total"
+CACHE_HITS = "play_store_cache_hits_total"
+PARSE_SECONDS = "play_store_parse_seconds"
+DECODE_SECONDS = "play_store_decode_seconds"
+REVIEWS = "play_store_reviews_total"
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsSink(ABC):
+    """Receives scraper measurements; labels are ``app`` and ``endpoint``."""
+
+    @abstractmethod
+    def increment(self, name: str, value: float = 1, **labels):
+        ...
+
+    @abstractmethod
+    def observe(self, name: str, value: float, **labels):
+        ...
+
+
+class NullSink(MetricsSink):
+    def increment(self, name: str, value: float = 1, **labels):
+        pass
+
+    def observe(self, name: str, value: float, **labels):
+        pass
+
+
+class LogSink(MetricsSink):
+    """One JSON line per measurement on the ``play_store.metrics`` logger."""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("play_store.metrics")
+        self.level = level
+
+    def _emit(self, kind: str, name: str, value: float, labels: dict):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level,
+                json.dumps({"metric": name, "type": kind, "value": value, **labels}),
+            )
+
+    def increment(self, name: str, value: float = 1, **labels):
+        self._emit("counter", name, value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        self._emit("summary", name, value, labels)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: _Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class PrometheusSink(MetricsSink):
+    """Aggregates in memory and renders the Prometheus text format.
+
+    Counters are summed, observations become summaries (``_sum``/``_count``).
+    :meth:`serve` exposes :meth:`render` at ``/metrics`` from a daemon thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[_Labels, float]] = defaultdict(dict)
+        self._summaries: Dict[str, Dict[_Labels, list]] = defaultdict(dict)
+        self._server = None
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._summaries[name].setdefault(key, [0.0, 0])
+            series[0] += value
+            series[1] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self._summaries.items()):
+                lines.append(f"# TYPE {name} summary")
+                for labels, (total, count) in series.items():
+                    label_text = _format_labels(labels)
+                    lines.append(f"{name}_sum{label_text} {total}")
+                    lines.append(f"{name}_count{label_text} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="play-store-metrics", daemon=True
+        ).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_default_sink: Optional[MetricsSink] = None
+
+
+def get_default_sink() -> MetricsSink:
+    """The sink chosen by ``PLAY_STORE_METRICS`` (``log`` or ``prometheus``).
+
+    A Prometheus sink is served on ``PLAY_STORE_METRICS_PORT`` when it is set;
+    anything else disables metrics.
+    """
+    global _default_sink
+    if _default_sink is None:
+        kind = os.getenv("PLAY_STORE_METRICS", "").lower()
+        if kind == "log":
+            _default_sink = LogSink()
+        elif kind == "prometheus":
+            _default_sink = PrometheusSink()
+            port = os.getenv("PLAY_STORE_METRICS_PORT")
+            if port:
+                _default_sink.serve(int(port))
+        else:
+            _default_sink = NullSink()
+    return _default_sink
@@ -1,11 +1,21 @@
-import json
+import asyncio
 import re
 import time
-from typing import Dict, List, Optional, Tuple, Union
+from typing import (AsyncIterator, Coroutine, Dict, Iterator, List, Optional,
+                    Tuple, Union)
 
 import httpx
+from Spiders.PlayStoreScraper import batchexecute, metrics
 from Spiders.PlayStoreScraper.constants import play_store_elements as elements
 from Spiders.PlayStoreScraper.constants import play_store_enums
+from Spiders.PlayStoreScraper.details_parser import LazyDetailsDataset
+from Spiders.PlayStoreScraper.http_cache import HttpCache, get_default_cache
+from Spiders.PlayStoreScraper.review_decoder import REVIEW_DECODER, ReviewRecord
+from Spiders.PlayStoreScraper.shared_limiter import get_default_rate_limiter
+from Spiders.PlayStoreScraper.throttle import (AdaptivePageSizer, RateLimiter,
+                                               backoff_delay)
+from Spiders.PlayStoreScraper.transport import (PlayStoreTransport,
+                                                get_default_transport)
 
 PLAY_STORE_BASE_URL = "https://play.google.com"
 REVIEWS_REGEX = re.compile(r"\)]}'\n\n([\s\S]+)")
@@ -13,6 +23,10 @@ APP_SCRIPT_REGEX = re.compile(r"AF_initDataCallback[\s\S]*?</script")
 APP_KEY_REGEX = re.compile("(ds:.*?)'")
 APP_VALUE_REGEX = re.compile(r"data:([\s\S]*?), sideChannel: {}}\);<\/")
 MAX_COUNT_EACH_FETCH = 4500
+GATEWAY_ERROR = {
+    str: "com.google.play.gateway.proto.PlayGatewayError",
+    bytes: b"com.google.play.gateway.proto.PlayGatewayError",
+}
 
 
 class ContinuationToken:
@@ -37,62 +51,199 @@ class ContinuationToken:
         self.filter_score_with = filter_score_with
         self.filter_device_with = filter_device_with
 
+    def to_dict(self) -> Dict:
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ContinuationToken":
+        return cls(**{attr: data.get(attr) for attr in cls.__slots__})
+
+
+class PlayGatewayError(Exception):
+    def __init__(self, message="com.google.play.gateway.proto.PlayGatewayError"):
+        super().__init__(message)
+
+
+class RequestStats:
+    __slots__ = ("attempts", "throttles", "latency", "bytes_received")
+
+    def __init__(self):
+        self.attempts = 0
+        self.throttles = 0
+        self.latency = 0.0
+        self.bytes_received = 0
+
 
 class PlayStoreRequest:
     _MAX_RETRIES = 5
     _RATE_LIMIT_DELAY = 5
+    _RETRY_DELAY = 1
+    _MAX_BACKOFF = 60
+
+    def __init__(
+        self,
+        transport: Optional[PlayStoreTransport] = None,
+        cache: Optional[HttpCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        metrics_sink: Optional[metrics.MetricsSink] = None,
+    ):
+        self.transport = transport or get_default_transport()
+        self.cache = cache if cache is not None else get_default_cache()
+        self.rate_limiter = (
+            rate_limiter if rate_limiter is not None else get_default_rate_limiter()
+        )
+        self.metrics = (
+            metrics_sink if metrics_sink is not None else metrics.get_default_sink()
+        )
+
+    async def _acquire(self, labels: dict):
+        if self.rate_limiter is not None:
+            waited = await self.rate_limiter.acquire()
+            self.metrics.observe(metrics.RATE_LIMIT_WAIT_SECONDS, waited, **labels)
+
+    def _observe_response(self, stats: RequestStats, response, labels: dict):
+        size = len(response.content)
+        stats.bytes_received += size
+        self.metrics.observe(metrics.REQUEST_SECONDS, stats.latency, **labels)
+        self.metrics.increment(metrics.RESPONSE_BYTES, size, **labels)
+
+    async def _cached(
+        self, method: str, url: str, data, stats: RequestStats, labels: dict
+    ) -> Optional[bytes]:
+        if self.cache is None:
+            return None
+        entry = await asyncio.to_thread(self.cache.cached, method, url, data)
+        if entry is None:
+            return None
+        self.metrics.increment(metrics.CACHE_HITS, **labels)
+        # what the recorded request saw, for the page sizer to replay
+        stats.latency = entry.meta.get("latency", 0.0)
+        stats.throttles = entry.meta.get("throttles", 0)
+        return entry.content
+
+    async def _record(
+        self, method: str, url: str, data, content: bytes, stats: RequestStats
+    ):
+        if self.cache is not None:
+            meta = {"latency": stats.latency, "throttles": stats.throttles}
+            await asyncio.to_thread(self.cache.record, method, url, data, content, meta)
+
+    async def apost(
+        self,
+        url: str,
+        data: Union[str, bytes],
+        headers: dict,
+        as_bytes: bool = False,
+        stats: Optional[RequestStats] = None,
+        labels: Optional[dict] = None,
+    ) -> Union[str, bytes]:
+        stats = stats if stats is not None else RequestStats()
+        labels = labels or {}
+        cached = await self._cached("POST", url, data, stats, labels)
+        if cached is not None:
+            return cached if as_bytes else cached.decode("utf-8")
 
-    def post(self, url: str, data: Union[str, bytes], headers: dict) -> str:
         last_exception = None
-        rate_exceeded_count = 0
+        failures = 0
 
         for _ in range(self._MAX_RETRIES):
+            if last_exception is not None:
+                # full-jitter exponential back-off, throttles start higher
+                base = (
+                    self._RATE_LIMIT_DELAY
+                    if isinstance(last_exception, PlayGatewayError)
+                    else self._RETRY_DELAY
+                )
+                delay = backoff_delay(failures, base, self._MAX_BACKOFF)
+                await asyncio.sleep(delay)
+                self.metrics.observe(metrics.BACKOFF_SECONDS, delay, **labels)
+                self.metrics.increment(metrics.RETRIES, **labels)
+            await self._acquire(labels)
+            stats.attempts += 1
+            started = time.perf_counter()
             try:
-                response = httpx.post(url, data=data, headers=headers)
+                response = await self.transport.post(url, data=data, headers=headers)
+                stats.latency = time.perf_counter() - started
+                self._observe_response(stats, response, labels)
                 response.raise_for_status()
-                response_text = response.text
-
-                if "com.google.play.gateway.proto.PlayGatewayError" in response_text:
-                    rate_exceeded_count += 1
-                    last_exception = Exception(
-                        "com.google.play.gateway.proto.PlayGatewayError"
-                    )
-                    time.sleep(self._RATE_LIMIT_DELAY * rate_exceeded_count)
+                # the raw body is enough for the batchexecute parser, skip
+                # decoding megabytes of text when the caller asks for bytes
+                content = response.content if as_bytes else response.text
+
+                if GATEWAY_ERROR[type(content)] in content:
+                    stats.throttles += 1
+                    self.metrics.increment(metrics.THROTTLES, **labels)
+                    failures += 1
+                    last_exception = PlayGatewayError()
                     continue
-                return response_text
-            except httpx.HTTPError as e:
-                if e.response and e.response.status_code == 404:
+                await self._record("POST", url, data, response.content, stats)
+                return content
+            except httpx.HTTPStatusError as e:
+                self.metrics.increment(metrics.REQUEST_ERRORS, **labels)
+                if e.response.status_code == 404:
                     raise Exception("App not found (404).")
+                failures += 1
                 last_exception = e
             except httpx.RequestError as e:
+                self.metrics.increment(metrics.REQUEST_ERRORS, **labels)
+                failures += 1
                 last_exception = e
-                continue
         raise last_exception
 
+    async def aget(
+        self,
+        url: str,
+        stats: Optional[RequestStats] = None,
+        labels: Optional[dict] = None,
+    ) -> str:
+        stats = stats if stats is not None else RequestStats()
+        labels = labels or {}
+        cached = await self._cached("GET", url, None, stats, labels)
+        if cached is not None:
+            return cached.decode("utf-8")
+        await self._acquire(labels)
+        stats.attempts += 1
+        started = time.perf_counter()
+        try:
+            response = await self.transport.get(url)
+        except httpx.RequestError:
+            self.metrics.increment(metrics.REQUEST_ERRORS, **labels)
+            raise
+        stats.latency = time.perf_counter() - started
+        self._observe_response(stats, response, labels)
+        if response.is_error:
+            self.metrics.increment(metrics.REQUEST_ERRORS, **labels)
+        response.raise_for_status()
+        await self._record("GET", url, None, response.content, stats)
+        return response.text
+
+    def post(self, url: str, data: Union[str, bytes], headers: dict) -> str:
+        return self.run(self.apost(url, data, headers))
+
     def get(self, url) -> str:
-        with httpx.Client() as client:
-            try:
-                response = client.get(url)
-                response.raise_for_status()
-                return response.text
-            except httpx.RequestError as e:
-                raise e
+        return self.run(self.aget(url))
+
+    def run(self, coro: Coroutine):
+        return self.transport.run(coro)
 
 
 class PlayStoreReviews:
-    __URL_FORMAT = (
-        "{}/_/PlayStoreUi/data/batchexecute?hl={{lang}}&gl={{country}}".format(
-            PLAY_STORE_BASE_URL
-        )
-    )
+    __URL_FORMAT = "{base_url}/_/PlayStoreUi/data/batchexecute?hl={lang}&gl={country}"
     __PAYLOAD_FORMAT_FOR_FIRST_PAGE = "f.req=%5B%5B%5B%22oCPfdb%22%2C%22%5Bnull%2C%5B2%2C{sort}%2C%5B{count}%5D%2Cnull%2C%5Bnull%2C{score}%2Cnull%2Cnull%2Cnull%2Cnull%2Cnull%2Cnull%2C{device_id}%5D%5D%2C%5B%5C%22{app_id}%5C%22%2C7%5D%5D%22%2Cnull%2C%22generic%22%5D%5D%5D%0A"
     __PAYLOAD_FORMAT_FOR_PAGINATED_PAGE = "f.req=%5B%5B%5B%22oCPfdb%22%2C%22%5Bnull%2C%5B2%2C{sort}%2C%5B{count}%2Cnull%2C%5C%22{pagination_token}%5C%22%5D%2Cnull%2C%5Bnull%2C{score}%2Cnull%2Cnull%2Cnull%2Cnull%2Cnull%2Cnull%2C{device_id}%5D%5D%2C%5B%5C%22{app_id}%5C%22%2C7%5D%5D%22%2Cnull%2C%22generic%22%5D%5D%5D%0A"
 
-    def __init__(self):
-        self.__play_store_req = PlayStoreRequest()
+    def __init__(
+        self,
+        request: Optional[PlayStoreRequest] = None,
+        base_url: str = PLAY_STORE_BASE_URL,
+    ):
+        self.__play_store_req = request or PlayStoreRequest()
+        self.base_url = base_url.rstrip("/")
 
     def __build_url(self, lang: str, country: str) -> str:
-        return self.__URL_FORMAT.format(lang=lang, country=country)
+        return self.__URL_FORMAT.format(
+            base_url=self.base_url, lang=lang, country=country
+        )
 
     def __build_url_body(
         self,
@@ -122,7 +273,7 @@ class PlayStoreReviews:
             )
         return result.encode()
 
-    def _fetch_review_items(
+    async def _fetch_review_items(
         self,
         url: str,
         app_id: str,
@@ -131,8 +282,10 @@ class PlayStoreReviews:
         filter_score_with: Optional[int],
         filter_device_with: Optional[int],
         pagination_token: Optional[str],
+        stats: Optional[RequestStats] = None,
     ):
-        dom = self.__play_store_req.post(
+        labels = {"app": app_id, "endpoint": "reviews"}
+        dom = await self.__play_store_req.apost(
             url,
             self.__build_url_body(
                 app_id,
@@ -143,19 +296,27 @@ class PlayStoreReviews:
                 pagination_token,
             ),
             {"content-type": "application/x-www-form-urlencoded"},
+            as_bytes=True,
+            stats=stats,
+            labels=labels,
         )
-        match = json.loads(REVIEWS_REGEX.findall(dom)[0])
-        try:
-            token = json.loads(match[0][2])[-2][-1]
-        except:
-            token = None
-
-        results = json.loads(match[0][2])
-        if len(results) == 0 or len(results[0]) == 0:
-            return [], token
-        return results[0], token
-
-    def reviews(
+        started = time.perf_counter()
+        parsed = batchexecute.parse_reviews_response(dom)
+        self.__play_store_req.metrics.observe(
+            metrics.PARSE_SECONDS, time.perf_counter() - started, **labels
+        )
+        return parsed
+
+    def _decode(self, app_id: str, review_items: list) -> List[ReviewRecord]:
+        started = time.perf_counter()
+        records = REVIEW_DECODER.decode_page(review_items)
+        sink = self.__play_store_req.metrics
+        labels = {"app": app_id, "endpoint": "reviews"}
+        sink.observe(metrics.DECODE_SECONDS, time.perf_counter() - started, **labels)
+        sink.increment(metrics.REVIEWS, len(records), **labels)
+        return records
+
+    async def areviews(
         self,
         app_id: str,
         lang: str = "en",
@@ -165,7 +326,7 @@ class PlayStoreReviews:
         filter_score_with: int = None,
         filter_device_with: int = None,
         continuation_token: ContinuationToken = None,
-    ) -> Optional[Tuple[List[dict], ContinuationToken]]:
+    ) -> Optional[Tuple[List[ReviewRecord], ContinuationToken]]:
         sort = sort.value
 
         if continuation_token is not None:
@@ -198,7 +359,7 @@ class PlayStoreReviews:
                 _fetch_count = MAX_COUNT_EACH_FETCH
 
             try:
-                review_items, token = self._fetch_review_items(
+                review_items, token = await self._fetch_review_items(
                     url,
                     app_id,
                     sort,
@@ -211,13 +372,7 @@ class PlayStoreReviews:
                 token = None
                 break
 
-            for review in review_items:
-                result.append(
-                    {
-                        k: spec.extract_content(review)
-                        for k, spec in elements.ElementSpecs().Review.items()
-                    }
-                )
+            result.extend(self._decode(app_id, review_items))
 
             _fetch_count = count - len(result)
 
@@ -234,57 +389,172 @@ class PlayStoreReviews:
             ),
         )
 
-    def reviews_all(self, app_id: str, sleep_milliseconds: int = 0, **kwargs) -> List:
-        continuation_token = None
-        result = []
-        while True:
-            _result, continuation_token = self.reviews(
+    def reviews(
+        self,
+        app_id: str,
+        lang: str = "en",
+        country: str = "us",
+        sort: play_store_enums.Sort = play_store_enums.Sort.NEWEST,
+        count: int = 100,
+        filter_score_with: int = None,
+        filter_device_with: int = None,
+        continuation_token: ContinuationToken = None,
+    ) -> Optional[Tuple[List[ReviewRecord], ContinuationToken]]:
+        return self.__play_store_req.run(
+            self.areviews(
                 app_id,
-                count=MAX_COUNT_EACH_FETCH,
-                continuation_token=continuation_token,
-                **kwargs
+                lang,
+                country,
+                sort,
+                count,
+                filter_score_with,
+                filter_device_with,
+                continuation_token,
             )
-            result.extend(_result)
-            if continuation_token.token is None:
+        )
+
+    async def aiter_pages(
+        self,
+        app_id: str,
+        lang: str = "en",
+        country: str = "us",
+        sort: play_store_enums.Sort = play_store_enums.Sort.NEWEST,
+        count: int = MAX_COUNT_EACH_FETCH,
+        filter_score_with: int = None,
+        filter_device_with: int = None,
+        continuation_token: ContinuationToken = None,
+        page_sizer: Optional[AdaptivePageSizer] = None,
+    ) -> AsyncIterator[Tuple[List[ReviewRecord], ContinuationToken]]:
+        """Yield one decoded batchexecute page at a time with its token.
+
+        Unlike :meth:`areviews`, nothing is accumulated across pages and fetch
+        errors propagate, so a caller can resume from the last yielded token.
+        With ``page_sizer`` the ``count`` of each request follows the sizer,
+        which is fed the latency and throttling of every page. Reviews are
+        :class:`ReviewRecord` objects; ``to_dict()`` gives the old dict layout.
+        """
+        sort = sort.value
+        token = None
+
+        if continuation_token is not None:
+            token = continuation_token.token
+            if token is None:
+                return
+            lang = continuation_token.lang
+            country = continuation_token.country
+            sort = continuation_token.sort
+            count = continuation_token.count
+            filter_score_with = continuation_token.filter_score_with
+            filter_device_with = continuation_token.filter_device_with
+
+        url = self.__build_url(lang=lang, country=country)
+        count = min(count, MAX_COUNT_EACH_FETCH)
+
+        while True:
+            if page_sizer is not None:
+                count = page_sizer.count
+            stats = RequestStats()
+            try:
+                review_items, token = await self._fetch_review_items(
+                    url,
+                    app_id,
+                    sort,
+                    count,
+                    filter_score_with,
+                    filter_device_with,
+                    token,
+                    stats,
+                )
+            except PlayGatewayError:
+                if page_sizer is not None:
+                    page_sizer.observe(stats.latency, throttled=True)
+                raise
+            if page_sizer is not None:
+                page_sizer.observe(stats.latency, throttled=stats.throttles > 0)
+            if isinstance(token, list):
+                token = None
+
+            page = self._decode(app_id, review_items)
+            yield page, ContinuationToken(
+                token, lang, country, sort, count, filter_score_with, filter_device_with
+            )
+
+            if token is None or not review_items:
                 break
-            if sleep_milliseconds:
-                time.sleep(sleep_milliseconds / 1000)
+
+    def iter_pages(
+        self, app_id: str, **kwargs
+    ) -> Iterator[Tuple[List[ReviewRecord], ContinuationToken]]:
+        """Sync variant of :meth:`aiter_pages`, fetching lazily page by page."""
+        pages = self.aiter_pages(app_id, **kwargs)
+        try:
+            while True:
+                try:
+                    yield self.__play_store_req.run(pages.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            self.__play_store_req.run(pages.aclose())
+
+    async def areviews_all(
+        self, app_id: str, sleep_milliseconds: int = 0, **kwargs
+    ) -> List:
+        result = []
+        try:
+            async for page, _ in self.aiter_pages(app_id, **kwargs):
+                result.extend(page)
+                if sleep_milliseconds:
+                    await asyncio.sleep(sleep_milliseconds / 1000)
+        except Exception:
+            # keep the partial result like reviews() does on a failed fetch
+            pass
         return result
 
+    def reviews_all(self, app_id: str, sleep_milliseconds: int = 0, **kwargs) -> List:
+        return self.__play_store_req.run(
+            self.areviews_all(app_id, sleep_milliseconds, **kwargs)
+        )
+
 
 class PlayStoreAppDetails:
-    __URL_FORMAT = (
-        "{}/store/apps/details?id={{app_id}}&hl={{lang}}&gl={{country}}".format(
-            PLAY_STORE_BASE_URL
-        )
-    )
+    __URL_FORMAT = "{base_url}/store/apps/details?id={app_id}&hl={lang}&gl={country}"
 
-    def __init__(self):
-        self.__play_store_req = PlayStoreRequest()
+    def __init__(
+        self,
+        request: Optional[PlayStoreRequest] = None,
+        base_url: str = PLAY_STORE_BASE_URL,
+    ):
+        self.__play_store_req = request or PlayStoreRequest()
+        self.base_url = base_url.rstrip("/")
         self.url = None
 
     def __build_url(self, app_id: str, lang: str, country: str) -> str:
-        return self.__URL_FORMAT.format(app_id=app_id, lang=lang, country=country)
+        return self.__URL_FORMAT.format(
+            base_url=self.base_url, app_id=app_id, lang=lang, country=country
+        )
 
-    def __fetch_app_details(
+    async def __fetch_app_details(
         self, app_id: str, lang: str = "en", country: str = "us"
     ) -> str:
         self.url = self.__build_url(app_id, lang, country)
-        app_text = self.__play_store_req.get(self.url)
+        app_text = await self.__play_store_req.aget(
+            self.url, labels={"app": app_id, "endpoint": "details"}
+        )
         return app_text
 
     def app(self, app_id: str, lang: str = "en", country: str = "us", **kwargs) -> Dict:
-        app_text = self.__fetch_app_details(app_id, lang, country)
-        matched_result = APP_SCRIPT_REGEX.findall(app_text)
-        dataset: Dict = {}
-
-        for match in matched_result:
-            key_match = APP_KEY_REGEX.findall(match)
-            value_match = APP_VALUE_REGEX.findall(match)
-            if key_match and value_match:
-                key = key_match[0]
-                value = json.loads(value_match[0])
-                dataset[key] = value
+        return self.__play_store_req.run(self.aapp(app_id, lang, country, **kwargs))
+
+    async def aapp(
+        self, app_id: str, lang: str = "en", country: str = "us", **kwargs
+    ) -> Dict:
+        app_text = await self.__fetch_app_details(app_id, lang, country)
+        sink = self.__play_store_req.metrics
+        labels = {"app": app_id, "endpoint": "details"}
+        started = time.perf_counter()
+        dataset = LazyDetailsDataset(app_text)
+        located = time.perf_counter()
+        sink.observe(metrics.PARSE_SECONDS, located - started, **labels)
         result = {}
 
         for k, spec in elements.ElementSpecs.Detail.items():
@@ -293,8 +563,10 @@ class PlayStoreAppDetails:
                 result[k] = spec.fallback_value
             else:
                 result[k] = content
+        # ds: blocks are decoded lazily while the specs read them
+        sink.observe(metrics.DECODE_SECONDS, time.perf_counter() - located, **labels)
 
         result["appId"] = app_id
-        result["url"] = self.url
+        result["url"] = self.__build_url(app_id, lang, country)
 
         return result
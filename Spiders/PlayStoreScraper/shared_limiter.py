@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from Spiders.PlayStoreScraper.throttle import RateLimiter, TokenBucket
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import redis
+except ImportError:  # optional, the file limiter is used without it
+    redis = None
+
+DEFAULT_REDIS_KEY = "play_store:rate_limit"
+DEFAULT_LIMIT_FILE = Path(tempfile.gettempdir()) / "play_store_rate_limit.json"
+
+# Same reservation bucket as TokenBucket, run atomically inside Redis with the
+# server clock so every host sees one bucket. Numbers go back as strings
+# because Redis truncates Lua numbers to integers.
+_RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate) - requested
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+local wait = 0
+if tokens < 0 then wait = -tokens / rate end
+return {tostring(tokens), tostring(wait)}
+"""
+
+
+class FileRateLimiter(RateLimiter):
+    """Bucket shared by the processes of one host through a locked file."""
+
+    blocking_reserve = True
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        path: Union[str, Path] = DEFAULT_LIMIT_FILE,
+    ):
+        super().__init__(rate, capacity)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+
+    def _locked_update(self, requested: float):
+        with open(self.path, "r+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                now = time.time()
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                tokens = state.get("tokens", self.capacity)
+                updated = state.get("updated", now)
+                tokens = min(
+                    self.capacity, tokens + max(0.0, now - updated) * self.rate
+                )
+                tokens -= requested
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({"tokens": tokens, "updated": now}))
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return tokens
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        remaining = self._locked_update(tokens)
+        return 0.0 if remaining >= 0 else -remaining / self.rate
+
+    @property
+    def budget(self) -> float:
+        return self._locked_update(0)
+
+
+class RedisRateLimiter(RateLimiter):
+    """Bucket shared by every process and host that uses the same Redis key.
+
+    If Redis cannot be reached the reservation falls back to ``fallback``
+    (a host-local :class:`FileRateLimiter` by default) instead of failing.
+    """
+
+    blocking_reserve = True
+
+    def __init__(
+        self,
+        url: str,
+        rate: float,
+        capacity: Optional[float] = None,
+        key: str = DEFAULT_REDIS_KEY,
+        fallback: Optional[RateLimiter] = None,
+    ):
+        if redis is None:
+            raise ImportError("RedisRateLimiter needs the redis package")
+        super().__init__(rate, capacity)
+        self.key = key
+        self.client = redis.Redis.from_url(url, socket_timeout=2)
+        self._script = self.client.register_script(_RESERVE_SCRIPT)
+        self.fallback = fallback or FileRateLimiter(rate, capacity)
+        self._redis_down = False
+
+    def _update(self, requested: float):
+        try:
+            tokens, wait = self._script(
+                keys=[self.key], args=[self.rate, self.capacity, requested]
+            )
+        except redis.RedisError as e:
+            if not self._redis_down:
+                logging.warning(f"Rate limiter Redis unavailable, using file: {e}")
+                self._redis_down = True
+            return None
+        if self._redis_down:
+            logging.info("Rate limiter Redis is back")
+            self._redis_down = False
+        return float(tokens), float(wait)
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        result = self._update(tokens)
+        if result is None:
+            return self.fallback.reserve(tokens)
+        return result[1]
+
+    @property
+    def budget(self) -> float:
+        result = self._update(0)
+        if result is None:
+            return self.fallback.budget
+        return result[0]
+
+
+_default_rate_limiter: Optional[RateLimiter] = None
+
+
+def rate_limiter_from_env() -> Optional[RateLimiter]:
+    """Build the limiter described by the environment, None when unset.
+
+    ``PLAY_STORE_RATE_LIMIT`` (requests/second) and ``PLAY_STORE_RATE_BURST``
+    size the bucket. ``PLAY_STORE_RATE_LIMIT_SCOPE`` is ``shared`` (default)
+    or ``process``. Shared buckets live in Redis at
+    ``PLAY_STORE_RATE_LIMIT_REDIS_URL`` (else ``CELERY_BROKER_URL``) and fall
+    back to the file at ``PLAY_STORE_RATE_LIMIT_FILE``.
+    """
+    rate = os.getenv("PLAY_STORE_RATE_LIMIT")
+    if not rate:
+        return None
+    rate = float(rate)
+    burst = os.getenv("PLAY_STORE_RATE_BURST")
+    capacity = float(burst) if burst else None
+    if os.getenv("PLAY_STORE_RATE_LIMIT_SCOPE", "shared") == "process":
+        return TokenBucket(rate, capacity)
+
+    file_limiter = FileRateLimiter(
+        rate, capacity, os.getenv("PLAY_STORE_RATE_LIMIT_FILE", DEFAULT_LIMIT_FILE)
+    )
+    redis_url = os.getenv("PLAY_STORE_RATE_LIMIT_REDIS_URL") or os.getenv(
+        "CELERY_BROKER_URL"
+    )
+    if redis_url and redis is not None:
+        return RedisRateLimiter(redis_url, rate, capacity, fallback=file_limiter)
+    return file_limiter
+
+
+def get_default_rate_limiter() -> Optional[RateLimiter]:
+    """The process-wide limiter every ``PlayStoreRequest`` consults."""
+    global _default_rate_limiter
+    if _default_rate_limiter is None:
+        _default_rate_limiter = rate_limiter_from_env()
+    return _default_rate_limiter
@@ -0,0 +1,143 @@
+import asyncio
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+DEFAULT_BACKOFF_CAP = 60.0
+MIN_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 4500  # MAX_COUNT_EACH_FETCH
+
+
+def backoff_delay(
+    attempt: int, base: float, cap: float = DEFAULT_BACKOFF_CAP, rnd=random
+) -> float:
+    """Full-jitter exponential back-off for the ``attempt``-th retry (from 1).
+
+    Spreading retries over ``[0, base * 2 ** (attempt - 1)]`` stops crawlers
+    that were throttled together from retrying together.
+    """
+    return rnd.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class LimiterMetrics:
+    __slots__ = ("acquisitions", "waited_total", "last_wait", "max_wait")
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.waited_total = 0.0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+
+    def observe(self, wait: float):
+        self.acquisitions += 1
+        self.waited_total += wait
+        self.last_wait = wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def to_dict(self) -> dict:
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+
+class RateLimiter(ABC):
+    """Reservation-based limiter: take tokens now, sleep off any deficit.
+
+    Waiters are served in reservation order and nothing is bound to an event
+    loop, so one limiter can serve sync and async callers alike.
+    """
+
+    blocking_reserve = False  # reserve() does I/O and runs in a thread
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.metrics = LimiterMetrics()
+
+    @abstractmethod
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` and return how long to wait before using them."""
+
+    @property
+    @abstractmethod
+    def budget(self) -> float:
+        """Tokens available now, negative while callers are queued."""
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Wait until ``tokens`` are available; returns the time waited."""
+        if self.blocking_reserve:
+            delay = await asyncio.to_thread(self.reserve, tokens)
+        else:
+            delay = self.reserve(tokens)
+        self.metrics.observe(delay)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class TokenBucket(RateLimiter):
+    """In-process token bucket: ``rate`` requests/second, bursts of ``capacity``."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        super().__init__(rate, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def budget(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptivePageSizer:
+    """Picks the batchexecute ``count`` from observed latency and throttling.
+
+    Additive-increase / multiplicative-decrease: fast pages grow the next
+    request, slow pages shrink it a little and gateway throttles halve it.
+    """
+
+    def __init__(
+        self,
+        initial: int = 1000,
+        minimum: int = MIN_PAGE_SIZE,
+        maximum: int = MAX_PAGE_SIZE,
+        target_latency: float = 5.0,
+        step: int = 500,
+        slow_factor: float = 0.8,
+        throttle_factor: float = 0.5,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.step = step
+        self.slow_factor = slow_factor
+        self.throttle_factor = throttle_factor
+        self.count = self._clamp(initial)
+
+    def _clamp(self, count: float) -> int:
+        return int(max(self.minimum, min(self.maximum, count)))
+
+    def observe(self, latency: float, throttled: bool = False) -> int:
+        if throttled:
+            self.count = self._clamp(self.count * self.throttle_factor)
+        elif latency > self.target_latency:
+            self.count = self._clamp(self.count * self.slow_factor)
+        elif latency < self.target_latency / 2:
+            self.count = self._clamp(self.count + self.step)
+        return self.count
+
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import weakref
+from typing import Coroutine, Optional, Union
+
+import httpx
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PlayStoreTransport:
+    """Long-lived, pooled ``httpx.AsyncClient`` shared by the scrapers.
+
+    The client is created lazily on first use so a transport can be built at
+    import time. Sync callers go through :meth:`run`, which executes the
+    coroutine on a private event loop thread, so the connection pool is reused
+    whether the caller is sync or async.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        timeout: float = DEFAULT_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        http2: bool = False,
+        headers: Optional[dict] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        # h2 is an optional extra (httpx[http2]), fall back to HTTP/1.1 without it
+        self.http2 = http2 and _http2_available()
+        self.headers = headers
+        # pooled connections are bound to the loop that opened them, so keep
+        # one client per loop (usually the caller's loop and the sync loop)
+        self._clients = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                headers=self.headers,
+            )
+            self._clients[loop] = client
+        return client
+
+    async def post(
+        self, url: str, data: Union[str, bytes], headers: Optional[dict] = None
+    ) -> httpx.Response:
+        return await self._get_client().post(url, content=data, headers=headers)
+
+    async def get(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        return await self._get_client().get(url, headers=headers)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="play-store-transport",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Coroutine):
+        """Run ``coro`` to completion from sync code on the transport loop."""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("PlayStoreTransport.run called from its own loop")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def aclose(self):
+        """Close the client owned by the running loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Close the sync loop thread and the client it owns."""
+        if self._loop is not None and not self._loop.is_closed():
+            self.run(self.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+
+_default_transport: Optional[PlayStoreTransport] = None
+
+
+def get_default_transport() -> PlayStoreTransport:
+    global _default_transport
+    if _default_transport is None:
+        _default_transport = PlayStoreTransport()
+    return _default_transport
@@ -0,0 +1,9 @@
+__all__ = [
+    "fixtures",
+    "bench_review_decoder",
+    "bench_batchexecute_parser",
+    "bench_details_parser",
+    "bench_review_memory",
+    "stub_server",
+    "bench_scraper",
+]
@@ -0,0 +1,78 @@
+"""Parse time of the regex + double json.loads path versus the batchexecute parser.
+
+    python -m Spiders.benchmarks.bench_batchexecute_parser [--page a.txt --page b.txt]
+"""
+import argparse
+import json
+import time
+
+from Spiders.benchmarks.fixtures import make_reviews_body
+from Spiders.PlayStoreScraper import batchexecute
+from Spiders.PlayStoreScraper.play_store_scraper import REVIEWS_REGEX
+
+
+def legacy_parse(dom):
+    match = json.loads(REVIEWS_REGEX.findall(dom)[0])
+    try:
+        token = json.loads(match[0][2])[-2][-1]
+    except Exception:
+        token = None
+    results = json.loads(match[0][2])
+    if len(results) == 0 or len(results[0]) == 0:
+        return [], token
+    return results[0], token
+
+
+def measure(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--page", action="append", help="recorded batchexecute response body"
+    )
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.page:
+        payloads = {}
+        for path in args.page:
+            with open(path, "rb") as f:
+                payloads[path] = f.read()
+    else:
+        body = make_reviews_body(args.rows).encode()
+        payloads = {f"synthetic {args.rows} rows": body}
+
+    for name, raw in payloads.items():
+        expected = legacy_parse(raw.decode("utf-8"))
+        assert expected == batchexecute.parse_reviews_response(raw, False)
+        cases = {
+            "regex + json.loads x2 (str)": lambda: legacy_parse(raw.decode("utf-8")),
+            "parser, json (bytes)": lambda: batchexecute.parse_reviews_response(
+                raw, use_orjson=False
+            ),
+        }
+        if batchexecute.orjson is not None:
+            cases["parser, orjson (bytes)"] = (
+                lambda: batchexecute.parse_reviews_response(raw, use_orjson=True)
+            )
+        print(f"{name}: {len(raw) / 1e6:.2f} MB, best of {args.repeat}")
+        baseline = None
+        for case, fn in cases.items():
+            elapsed = measure(fn, args.repeat)
+            baseline = baseline or elapsed
+            print(
+                f"  {case:<30} {elapsed * 1000:>8.2f} ms "
+                f"{len(raw) / elapsed / 1e6:>8.1f} MB/s  x{baseline / elapsed:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""CPU time and peak memory of the regex details parser versus lazy ds: blocks.
+
+    python -m Spiders.benchmarks.bench_details_parser [--page details.html]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from Spiders.benchmarks.fixtures import make_details_html
+from Spiders.PlayStoreScraper.constants import play_store_elements as elements
+from Spiders.PlayStoreScraper.details_parser import LazyDetailsDataset
+from Spiders.PlayStoreScraper.play_store_scraper import (APP_KEY_REGEX,
+                                                         APP_SCRIPT_REGEX,
+                                                         APP_VALUE_REGEX)
+
+
+def extract(dataset):
+    result = {}
+    for k, spec in elements.ElementSpecs.Detail.items():
+        content = spec.extract_content(dataset)
+        result[k] = spec.fallback_value if content is None else content
+    return result
+
+
+def legacy_parse(app_text):
+    dataset = {}
+    for match in APP_SCRIPT_REGEX.findall(app_text):
+        key_match = APP_KEY_REGEX.findall(match)
+        value_match = APP_VALUE_REGEX.findall(match)
+        if key_match and value_match:
+            dataset[key_match[0]] = json.loads(value_match[0])
+    return extract(dataset)
+
+
+def lazy_parse(app_text):
+    return extract(LazyDetailsDataset(app_text))
+
+
+def measure(fn, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page", help="recorded details page HTML")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.page:
+        html = Path(args.page).read_text(encoding="utf-8")
+    else:
+        html = make_details_html()
+    assert legacy_parse(html) == lazy_parse(html)
+
+    print(f"details page {len(html) / 1e6:.2f} MB, best of {args.repeat}")
+    cases = (("regex + json.loads all", legacy_parse), ("lazy ds:", lazy_parse))
+    for name, fn in cases:
+        elapsed, peak = measure(fn, html, args.repeat)
+        print(f"  {name:<24} {elapsed * 1000:>8.2f} ms  peak {peak / 1e6:>7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Rows/second of the per-row ElementSpecs path versus the compiled decoder.
+
+    python -m Spiders.benchmarks.bench_review_decoder [--page recorded.txt]
+"""
+import argparse
+import json
+import time
+
+from Spiders.benchmarks.fixtures import load_body
+from Spiders.PlayStoreScraper.constants import play_store_elements as elements
+from Spiders.PlayStoreScraper.review_decoder import ReviewDecoder
+
+
+def legacy_decode(rows):
+    return [
+        {
+            k: spec.extract_content(review)
+            for k, spec in elements.ElementSpecs().Review.items()
+        }
+        for review in rows
+    ]
+
+
+def measure(fn, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page", help="recorded batchexecute response body")
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    body = load_body(args.page, args.rows)
+    rows = json.loads(json.loads(body[body.index("\n\n") + 2 :])[0][2])[0]
+    decoder = ReviewDecoder()
+
+    assert legacy_decode(rows) == decoder.decode_page_as_dicts(rows)
+    results = {
+        "ElementSpecs per row": measure(legacy_decode, rows, args.repeat),
+        "ReviewDecoder.decode_page": measure(decoder.decode_page, rows, args.repeat),
+        "ReviewDecoder.decode_page_as_dicts": measure(
+            decoder.decode_page_as_dicts, rows, args.repeat
+        ),
+    }
+    baseline = results["ElementSpecs per row"]
+    print(f"{len(rows)} rows, best of {args.repeat}")
+    for name, rate in results.items():
+        print(f"{name:<36} {rate:>12,.0f} rows/s  x{rate / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    main()
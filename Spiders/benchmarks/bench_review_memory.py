@@ -0,0 +1,51 @@
+"""Memory held per review by decoded dicts versus slotted ReviewRecords.
+
+    python -m Spiders.benchmarks.bench_review_memory [--page recorded.txt]
+
+Each page is parsed and decoded under tracemalloc and only the decoded
+reviews are kept alive, as in ``reviews_all``; the raw rows are freed.
+"""
+import argparse
+import gc
+import tracemalloc
+
+from Spiders.benchmarks.fixtures import load_body
+from Spiders.PlayStoreScraper import batchexecute
+from Spiders.PlayStoreScraper.review_decoder import REVIEW_DECODER
+
+
+def retained(decode, body, pages):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = []
+    for _ in range(pages):
+        kept.extend(decode(batchexecute.parse_reviews_response(body)[0]))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return len(kept), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page", help="recorded batchexecute response body")
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+
+    body = load_body(args.page, args.rows)
+    cases = (
+        ("dicts", REVIEW_DECODER.decode_page_as_dicts),
+        ("ReviewRecord", REVIEW_DECODER.decode_page),
+    )
+    for name, decode in cases:
+        count, size = retained(decode, body, args.pages)
+        print(
+            f"{name:<14} {count} reviews  {size / 1e6:>7.2f} MB  "
+            f"{size / count:>6.0f} B/review"
+        )
+
+
+if __name__ == "__main__":
+    main()
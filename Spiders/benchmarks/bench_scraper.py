@@ -0,0 +1,170 @@
+"""End-to-end throughput of PlayStoreReviews and PlayStoreAppDetails.
+
+    python -m Spiders.benchmarks.bench_scraper [--total 20000] [--latency 0.05]
+        [--url http://127.0.0.1:8765]
+
+Without ``--url`` a stub server (see ``stub_server``) is started in a child
+process so its allocations stay out of the memory figures. Items are reviews
+for the review cases and details pages for ``app``; parse time is the parse
+and decode time the scraper reports to its metrics sink, and back-off time
+is spent sleeping between retries. Leave PLAY_STORE_CACHE_DIR and
+PLAY_STORE_RATE_LIMIT unset or the cache/limiter is measured too.
+"""
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+from collections import defaultdict
+
+from Spiders.benchmarks.stub_server import StubConfig, StubServer
+from Spiders.PlayStoreScraper import metrics
+from Spiders.PlayStoreScraper.play_store_scraper import (GATEWAY_ERROR,
+                                                         MAX_COUNT_EACH_FETCH,
+                                                         PlayStoreAppDetails,
+                                                         PlayStoreRequest,
+                                                         PlayStoreReviews)
+from Spiders.PlayStoreScraper.transport import PlayStoreTransport
+
+APP_ID = "com.example.app"
+
+
+class CountingTransport(PlayStoreTransport):
+    """Counts good pages and failed requests."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.reset()
+
+    def reset(self):
+        self.pages = 0
+        self.failures = 0
+
+    def _observe(self, response):
+        if response.is_error or GATEWAY_ERROR[bytes] in response.content:
+            self.failures += 1
+        else:
+            self.pages += 1
+        return response
+
+    async def post(self, url, data, headers=None):
+        return self._observe(await super().post(url, data, headers))
+
+    async def get(self, url, headers=None):
+        return self._observe(await super().get(url, headers))
+
+
+class TotalsSink(metrics.MetricsSink):
+    """Sums every measurement by name, whatever its labels."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        self.totals[name] += value
+
+    def observe(self, name: str, value: float, **labels):
+        self.totals[name] += value
+
+
+def _serve(config, queue):
+    server = StubServer(config=config)
+    queue.put(server.base_url)
+    server.httpd.serve_forever()
+
+
+def start_stub(config: StubConfig):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(config, queue), daemon=True)
+    process.start()
+    return process, queue.get(timeout=30)
+
+
+def run_case(transport, sink, fn, trace):
+    transport.reset()
+    sink.totals.clear()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    items = fn()
+    elapsed = time.perf_counter() - started
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    parse = sink.totals[metrics.PARSE_SECONDS] + sink.totals[metrics.DECODE_SECONDS]
+    backoff = sink.totals[metrics.BACKOFF_SECONDS]
+    return items, elapsed, transport.pages, transport.failures, parse, backoff, peak
+
+
+def fetch_details(details, times):
+    fetched = 0
+    for _ in range(times):
+        try:
+            details.app(APP_ID)
+            fetched += 1
+        except Exception:
+            # details are not retried, a failed page only counts as a failure
+            pass
+    return fetched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="use a stub that is already running")
+    parser.add_argument("--total", type=int, default=20_000)
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--details", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        config = StubConfig(
+            args.total, args.latency, args.jitter, args.throttle_rate, args.error_rate
+        )
+        process, base_url = start_stub(config)
+
+    transport = CountingTransport()
+    sink = TotalsSink()
+    request = PlayStoreRequest(transport=transport, metrics_sink=sink)
+    reviews = PlayStoreReviews(request, base_url=base_url)
+    details = PlayStoreAppDetails(request, base_url=base_url)
+
+    cases = (
+        ("reviews", lambda: len(reviews.reviews(APP_ID, count=args.count)[0])),
+        (
+            "reviews_all",
+            lambda: len(reviews.reviews_all(APP_ID, count=MAX_COUNT_EACH_FETCH)),
+        ),
+        ("app", lambda: fetch_details(details, args.details)),
+    )
+    try:
+        print(f"stub {base_url}")
+        print(
+            f"  {'case':<12} {'pages':>6} {'failed':>6} {'items':>8} {'pages/s':>9} "
+            f"{'items/s':>10} {'parse s':>8} {'backoff s':>9} {'peak MB':>8}"
+        )
+        for name, fn in cases:
+            fn()  # warm the connection pool and the stub's page cache
+            items, elapsed, pages, failed, parse, backoff, _ = run_case(
+                transport, sink, fn, False
+            )
+            peak = run_case(transport, sink, fn, True)[-1]
+            print(
+                f"  {name:<12} {pages:>6} {failed:>6} {items:>8} "
+                f"{pages / elapsed:>9.1f} "
+                f"{items / elapsed:>10.0f} {parse:>8.3f} {backoff:>9.3f} "
+                f"{peak / 1e6:>8.2f}"
+            )
+    finally:
+        transport.close()
+        if process is not None:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
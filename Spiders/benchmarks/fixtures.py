@@ -0,0 +1,135 @@
+# synthetic payloads shaped like recorded Play Store responses, used when no
+# recorded page is passed to a benchmark
+import json
+import random
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+REVIEW_TEXTS = (
+    "Good app",
+    "Nice",
+    "Keeps crashing after the last update, please fix the sync issue.",
+    "I have been using this reader for years. The new layout is cleaner but "
+    "the night mode toggle moved and the font settings reset every time I "
+    "open a new book. Otherwise still the best one on the store.",
+    "\U0001f44d\U0001f44d",
+    "Too many ads lately",
+)
+
+
+def make_review_row(i: int, rnd: random.Random) -> list:
+    at = 1_600_000_000 + rnd.randrange(100_000_000)
+    reply = None
+    if rnd.random() < 0.2:
+        reply = [None, "Thanks for the feedback!", [at + 86_400, 0]]
+    version = f"{rnd.randrange(1, 9)}.{rnd.randrange(0, 20)}.{rnd.randrange(0, 99)}"
+    return [
+        str(uuid.UUID(int=rnd.getrandbits(128))),
+        [
+            f"User {i}",
+            [None, 2, None, [None, None, f"https://play-lh.googleusercontent.com/a/{i}"]],
+        ],
+        rnd.randrange(1, 6),
+        None,
+        rnd.choice(REVIEW_TEXTS),
+        [at, 0],
+        rnd.randrange(0, 500),
+        reply,
+        None,
+        None,
+        version,
+    ]
+
+
+def make_review_rows(count: int, seed: int = 7) -> List[list]:
+    rnd = random.Random(seed)
+    return [make_review_row(i, rnd) for i in range(count)]
+
+
+def make_reviews_body(
+    count: int, token: Optional[str] = "CpEBCo4BKmsKCQj", seed: int = 7
+) -> str:
+    """A ``)]}'``-prefixed batchexecute response holding ``count`` reviews."""
+    inner = json.dumps([make_review_rows(count, seed), [None, token], None])
+    envelope = [
+        ["wrb.fr", "oCPfdb", inner, None, None, None, "generic"],
+        ["di", 412],
+        ["af.httprm", 411, "-4390212218389440046", 12],
+    ]
+    return ")]}'\n\n" + json.dumps(envelope)
+
+
+def load_body(path: Optional[str], count: int) -> str:
+    """A recorded response body from ``path``, or a synthetic one."""
+    if path:
+        return Path(path).read_text(encoding="utf-8")
+    return make_reviews_body(count)
+
+
+def _details_app_block(app_id: str, rnd: random.Random) -> list:
+    app = [None] * 150
+    app[0] = ["Moon+ Reader"]
+    app[9] = ["Everyone", None, [None, "Rated for 3+"]]
+    app[10] = ["Mar 1, 2011"]
+    app[12] = [[[None, "A full-featured ebook reader.<br>Supports EPUB and PDF."]]]
+    app[13] = ["10,000,000+", 10_000_000, 12_345_678]
+    app[48] = True
+    app[51] = [
+        [None, 4.51],
+        [None, [None, 1000], [None, 400], [None, 900], [None, 3000], [None, 40000]],
+        [None, 45300],
+        [None, 12000],
+    ]
+    app[57] = [[[[[None, [[0, "USD"]]]]]]]
+    app[68] = ["Moon+", [None, None, None, None, [None, None, "/store/apps/dev?id=123"]]]
+    app[69] = [
+        [None, None, None, None, None, [None, None, "https://example.com"]],
+        ["dev@example.com"],
+        ["1 Example Street"],
+    ]
+    app[73] = [[None, "Read ebooks with ease"]]
+    app[78] = [
+        [[None, None, None, [None, None, f"https://play-lh.example/s{i}"]]]
+        for i in range(24)
+    ]
+    app[79] = [[["Books & Reference", None, "BOOKS_AND_REFERENCE"]]]
+    app[95] = [[None, None, None, [None, None, "https://play-lh.example/icon"]]]
+    app[140] = [[["9.5"]]]
+    app[145] = [["Oct 1, 2025", [1759276800]]]
+    return [None, [None, None, app, app_id]]
+
+
+def _filler_block(rnd: random.Random, size: int) -> list:
+    return [
+        [f"com.example.similar{i}", rnd.random(), [rnd.choice(REVIEW_TEXTS)] * 4]
+        for i in range(size)
+    ]
+
+
+def make_details_html(
+    app_id: str = "com.example.app", filler_blocks: int = 12, seed: int = 7
+) -> str:
+    """A details page with ``AF_initDataCallback`` blocks like the real one.
+
+    Only ``ds:3``, ``ds:4`` and ``ds:5`` are read by ``ElementSpecs.Detail``;
+    the filler blocks stand in for similar apps, reviews and other sections.
+    """
+    rnd = random.Random(seed)
+    blocks = {f"ds:{i}": _filler_block(rnd, 400) for i in range(filler_blocks)}
+    blocks["ds:3"] = [[None, None, [[[None, [None, [None, [None, [0]]]]]]]]]
+    blocks["ds:4"] = [[None, None, [[[None, None, None, None, None, None]]]]]
+    blocks["ds:5"] = _details_app_block(app_id, rnd)
+    scripts = "".join(
+        f"<script class=\"ds:{key[3:]}\" nonce=\"x\">AF_initDataCallback({{"
+        f"key: '{key}', hash: '{rnd.randrange(10)}', data:{json.dumps(value)}, "
+        "sideChannel: {}});</script>"
+        for key, value in blocks.items()
+    )
+    return (
+        "<!doctype html><html><head><title>Play</title></head><body>"
+        + "<div>" * 200
+        + scripts
+        + "</div>" * 200
+        + "</body></html>"
+    )
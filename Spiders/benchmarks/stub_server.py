@@ -0,0 +1,210 @@
+"""Local stand-in for the Play Store batchexecute and details endpoints.
+
+    python -m Spiders.benchmarks.stub_server [--port 8765] [--total 20000]
+        [--latency 0.05] [--jitter 0.02] [--throttle-rate 0.0] [--error-rate 0.0]
+
+Point ``PlayStoreReviews``/``PlayStoreAppDetails`` at it with
+``base_url="http://127.0.0.1:8765"``. Pages honour the requested ``count``
+and pagination token until ``--total`` reviews are served per app.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from Spiders.benchmarks.fixtures import make_details_html, make_reviews_body
+
+GATEWAY_ERROR_BODY = (
+    ")]}'\n\n"
+    '[["er",null,null,null,null,500,null,null,null,3],'
+    '["di",12],["af.httprm",12,"com.google.play.gateway.proto.PlayGatewayError",3]]'
+)
+# the token carries the offset served so far, so pages may vary in size
+TOKEN_PREFIX = "stub-offset-"
+
+
+@lru_cache(maxsize=64)
+def reviews_page(count: int, offset: int, last: bool) -> bytes:
+    token = None if last else f"{TOKEN_PREFIX}{offset + count}"
+    return make_reviews_body(count, token, seed=offset).encode("utf-8")
+
+
+@lru_cache(maxsize=16)
+def details_page(app_id: str, filler_blocks: int) -> bytes:
+    return make_details_html(app_id, filler_blocks).encode("utf-8")
+
+
+def parse_reviews_request(body: bytes) -> Tuple[str, int, int]:
+    """``(app_id, count, offset)`` from an ``oCPfdb`` form body."""
+    freq = parse_qs(body.decode("utf-8"))["f.req"][0]
+    rpc = json.loads(json.loads(freq)[0][0][1])
+    paging = rpc[1][2]
+    token = paging[2] if len(paging) > 2 else None
+    offset = int(token[len(TOKEN_PREFIX):]) if token else 0
+    return rpc[2][0], int(paging[0]), offset
+
+
+class StubConfig:
+    __slots__ = (
+        "total",
+        "latency",
+        "jitter",
+        "throttle_rate",
+        "error_rate",
+        "filler_blocks",
+        "seed",
+    )
+
+    def __init__(
+        self,
+        total: int = 20_000,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        filler_blocks: int = 12,
+        seed: int = 7,
+    ):
+        self.total = total
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.filler_blocks = filler_blocks
+        self.seed = seed
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = StubConfig()
+    rnd = random.Random(7)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay_or_fail(self) -> bool:
+        """Sleep the injected latency; True when an error was sent instead."""
+        config = self.config
+        delay = config.latency + self.rnd.uniform(0, config.jitter)
+        if delay:
+            time.sleep(delay)
+        if config.error_rate and self.rnd.random() < config.error_rate:
+            self._send(503, b"Service Unavailable", "text/plain")
+            return True
+        return False
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not urlsplit(self.path).path.endswith("/batchexecute"):
+            self._send(404, b"Not Found", "text/plain")
+            return
+        if self._delay_or_fail():
+            return
+        if self.config.throttle_rate and self.rnd.random() < self.config.throttle_rate:
+            self._send(200, GATEWAY_ERROR_BODY.encode(), "application/json")
+            return
+        _, count, served = parse_reviews_request(body)
+        count = max(0, min(count, self.config.total - served))
+        last = served + count >= self.config.total
+        self._send(200, reviews_page(count, served, last), "application/json")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/store/apps/details":
+            self._send(404, b"Not Found", "text/plain")
+            return
+        if self._delay_or_fail():
+            return
+        app_id = parse_qs(url.query).get("id", ["com.example.app"])[0]
+        page = details_page(app_id, self.config.filler_blocks)
+        self._send(200, page, "text/html; charset=utf-8")
+
+
+class StubServer:
+    """The stub on a background thread; ``port=0`` picks a free port."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        config: Optional[StubConfig] = None,
+    ):
+        handler = type(
+            "BoundStubHandler",
+            (StubHandler,),
+            {"config": config or StubConfig(), "rnd": random.Random()},
+        )
+        handler.rnd.seed(handler.config.seed)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="play-store-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--total", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--filler-blocks", type=int, default=12)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        args.total,
+        args.latency,
+        args.jitter,
+        args.throttle_rate,
+        args.error_rate,
+        args.filler_blocks,
+    )
+    server = StubServer(args.host, args.port, config)
+    print(f"serving on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from sqlalchemy import and_, delete, select
+
+from Spiders.models.spider_models.models import CrawlCheckpointModel
+from Spiders.PlayStoreScraper.play_store_scraper import ContinuationToken
+
+
+@dataclass
+class CrawlCheckpoint:
+    app_id: str
+    country: str
+    token: ContinuationToken
+    pages: int = 0
+    reviews: int = 0
+    updated_at: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        data = dict(self.__dict__)
+        data["token"] = self.token.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CrawlCheckpoint":
+        data = dict(data)
+        data["token"] = ContinuationToken.from_dict(data["token"])
+        return cls(**data)
+
+
+class CheckpointStore(ABC):
+    """Where crawl checkpoints are kept, one per (app_id, country)."""
+
+    @abstractmethod
+    async def load(self, app_id: str, country: str) -> Optional[CrawlCheckpoint]:
+        ...
+
+    @abstractmethod
+    async def save(self, checkpoint: CrawlCheckpoint):
+        ...
+
+    @abstractmethod
+    async def clear(self, app_id: str, country: str):
+        ...
+
+
+class FileCheckpointStore(CheckpointStore):
+    """One JSON file per crawl, replaced atomically on every save."""
+
+    _UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, app_id: str, country: str) -> Path:
+        name = self._UNSAFE.sub("_", f"{app_id}__{country}")
+        return self.directory / f"{name}.json"
+
+    async def load(self, app_id: str, country: str) -> Optional[CrawlCheckpoint]:
+        path = self._path(app_id, country)
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return CrawlCheckpoint.from_dict(json.load(f))
+
+    async def save(self, checkpoint: CrawlCheckpoint):
+        checkpoint.updated_at = datetime.now(timezone.utc).isoformat()
+        path = self._path(checkpoint.app_id, checkpoint.country)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    async def clear(self, app_id: str, country: str):
+        self._path(app_id, country).unlink(missing_ok=True)
+
+
+class DatabaseCheckpointStore(CheckpointStore):
+    """Checkpoints in the ``crawl_checkpoints`` table next to ``app_reviews``.
+
+    ``session_factory`` is an async context manager yielding an
+    ``AsyncSession``, such as ``database.get_async_session``.
+    """
+
+    def __init__(self, session_factory: Callable):
+        self.session_factory = session_factory
+
+    @staticmethod
+    def _where(app_id: str, country: str):
+        return and_(
+            CrawlCheckpointModel.app_id == app_id,
+            CrawlCheckpointModel.app_country == country,
+        )
+
+    async def load(self, app_id: str, country: str) -> Optional[CrawlCheckpoint]:
+        async with self.session_factory() as session:
+            row = (
+                await session.execute(
+                    select(CrawlCheckpointModel).where(self._where(app_id, country))
+                )
+            ).scalar()
+        if row is None:
+            return None
+        return CrawlCheckpoint(
+            app_id=row.app_id,
+            country=row.app_country,
+            token=ContinuationToken(
+                row.token,
+                row.language,
+                row.app_country,
+                row.sort,
+                row.count,
+                row.filter_score_with,
+                row.filter_device_with,
+            ),
+            pages=row.pages,
+            reviews=row.reviews,
+            updated_at=row.updated_at.isoformat() if row.updated_at else None,
+        )
+
+    async def save(self, checkpoint: CrawlCheckpoint):
+        token = checkpoint.token
+        async with self.session_factory() as session:
+            await session.merge(
+                CrawlCheckpointModel(
+                    app_id=checkpoint.app_id,
+                    app_country=checkpoint.country,
+                    language=token.lang,
+                    token=token.token,
+                    sort=token.sort,
+                    count=token.count,
+                    filter_score_with=token.filter_score_with,
+                    filter_device_with=token.filter_device_with,
+                    pages=checkpoint.pages,
+                    reviews=checkpoint.reviews,
+                )
+            )
+            await session.commit()
+
+    async def clear(self, app_id: str, country: str):
+        async with self.session_factory() as session:
+            await session.execute(
+                delete(CrawlCheckpointModel).where(self._where(app_id, country))
+            )
+            await session.commit()
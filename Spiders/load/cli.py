@@ -0,0 +1,246 @@
+"""Load details and reviews of many apps.
+
+    python -m Spiders.load.cli apps.txt [--jobs 4] [--state run.state]
+        [--report run.json] [--incremental]
+    cut -f1 apps.tsv | python -m Spiders.load.cli -
+
+Each input line is ``app_id [country [lang]]``, separated by spaces, tabs or
+commas; blank lines and ``#`` comments are skipped. Finished apps are
+appended to the ``--state`` file and skipped when the same command is run
+again, and an interrupted review crawl resumes from its checkpoint. Progress
+goes to stderr, the report is JSON.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, TextIO, Tuple
+
+from Spiders.load.database import dispose_engine
+from Spiders.load.spider_load import load_data
+
+
+@dataclass(frozen=True)
+class AppTarget:
+    app_id: str
+    country: str = "us"
+    lang: str = "en"
+
+
+@dataclass
+class AppResult:
+    app_id: str
+    country: str
+    lang: str
+    ok: bool = False
+    reviews: int = 0
+    pages: int = 0
+    seconds: float = 0.0
+    task_ids: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def parse_targets(lines: Iterable[str], country: str, lang: str) -> List[AppTarget]:
+    """Targets in input order, duplicates dropped."""
+    targets = {}
+    for line in lines:
+        fields = re.split(r"[\s,]+", line.split("#", 1)[0].strip())
+        if not fields[0]:
+            continue
+        target = AppTarget(
+            fields[0],
+            fields[1] if len(fields) > 1 else country,
+            fields[2] if len(fields) > 2 else lang,
+        )
+        targets.setdefault(target, None)
+    return list(targets)
+
+
+def _key(target) -> Tuple[str, str, str]:
+    return target.app_id, target.country, target.lang
+
+
+def load_state(path: Optional[Path]) -> Set[Tuple[str, str, str]]:
+    """Apps a previous run with this state file loaded successfully."""
+    done = set()
+    if path is None or not path.exists():
+        return done
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if entry.get("ok"):
+                done.add((entry["app_id"], entry["country"], entry["lang"]))
+    return done
+
+
+class Progress:
+    """Apps done, review rate and ETA, redrawn on one line of ``stream``."""
+
+    def __init__(self, total: int, stream: TextIO = sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.done = 0
+        self.failed = 0
+        self.reviews = 0
+        self.started = time.perf_counter()
+        self.tty = stream.isatty()
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.reviews / elapsed if elapsed else 0.0
+        remaining = self.total - self.done
+        if self.done:
+            eta = str(timedelta(seconds=round(elapsed / self.done * remaining)))
+        else:
+            eta = "-"
+        return (
+            f"apps {self.done}/{self.total} ({self.failed} failed)  "
+            f"reviews {self.reviews}  {rate:.0f}/s  ETA {eta}"
+        )
+
+    def draw(self, final: bool = False):
+        if self.tty:
+            self.stream.write(f"\r\x1b[K{self.line()}" + ("\n" if final else ""))
+        else:
+            self.stream.write(self.line() + "\n")
+        self.stream.flush()
+
+    async def redraw_every(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.draw()
+
+
+async def load_app(
+    target: AppTarget, progress: Progress, resume: bool, incremental: bool
+) -> AppResult:
+    result = AppResult(target.app_id, target.country, target.lang)
+
+    def on_page(reviews: int):
+        result.pages += 1
+        result.reviews += reviews
+        progress.reviews += reviews
+
+    started = time.perf_counter()
+    try:
+        result.ok = await load_data(
+            target.app_id,
+            target.lang,
+            target.country,
+            resume=resume,
+            incremental=incremental,
+            task_ids=result.task_ids,
+            on_page=on_page,
+        )
+        if not result.ok:
+            result.error = "load failed, see the log"
+    except Exception as e:
+        logging.exception(f"Loading {target.app_id} failed")
+        result.error = repr(e)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+async def run(
+    targets: List[AppTarget],
+    jobs: int = 4,
+    state: Optional[Path] = None,
+    resume: bool = True,
+    incremental: bool = False,
+    progress_interval: float = 2.0,
+) -> dict:
+    done = load_state(state)
+    pending = [target for target in targets if _key(target) not in done]
+    progress = Progress(len(pending))
+    slots = asyncio.Semaphore(jobs)
+    results: List[AppResult] = []
+    started_at = datetime.now(timezone.utc)
+
+    async def worker(target: AppTarget):
+        async with slots:
+            result = await load_app(target, progress, resume, incremental)
+        results.append(result)
+        progress.done += 1
+        progress.failed += not result.ok
+        if state is not None:
+            with state.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps({**asdict(target), "ok": result.ok}) + "\n")
+
+    redraw = asyncio.ensure_future(progress.redraw_every(progress_interval))
+    try:
+        await asyncio.gather(*(worker(target) for target in pending))
+    finally:
+        redraw.cancel()
+        progress.draw(final=True)
+        await dispose_engine()
+    elapsed = time.perf_counter() - progress.started
+    return {
+        "started_at": started_at.isoformat(),
+        "seconds": round(elapsed, 3),
+        "apps": len(targets),
+        "skipped": len(targets) - len(pending),
+        "loaded": sum(result.ok for result in results),
+        "failed": sum(not result.ok for result in results),
+        "reviews": progress.reviews,
+        "reviews_per_second": round(progress.reviews / elapsed, 1) if elapsed else 0,
+        "results": [asdict(result) for result in results],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("input", help="file of app ids, - for stdin")
+    parser.add_argument("--country", default="us", help="when a line has none")
+    parser.add_argument("--lang", default="en", help="when a line has none")
+    parser.add_argument("--jobs", type=int, default=4, help="apps loaded at once")
+    parser.add_argument("--state", type=Path, help="finished apps, for reruns")
+    parser.add_argument("--report", type=Path, help="JSON report, else stdout")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="ignore review crawl checkpoints",
+    )
+    parser.add_argument("--progress-interval", type=float, default=2.0)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    if args.input == "-":
+        targets = parse_targets(sys.stdin, args.country, args.lang)
+    else:
+        with open(args.input, encoding="utf-8") as fh:
+            targets = parse_targets(fh, args.country, args.lang)
+
+    report = asyncio.run(
+        run(
+            targets,
+            jobs=args.jobs,
+            state=args.state,
+            resume=args.resume,
+            incremental=args.incremental,
+            progress_interval=args.progress_interval,
+        )
+    )
+    text = json.dumps(report, indent=2)
+    if args.report is not None:
+        args.report.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0 if not report["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import (AsyncEngine, async_sessionmaker,
+                                    create_async_engine)
+
+from Spiders.models.spider_models.models import BaseModel
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+load_dotenv(BASE_DIR / ".env")
+
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+_tables_created = False
+_tables_lock = asyncio.Lock()
+
+
+def database_url() -> str:
+    """``SPIDER_DATABASE_URL``, else the asyncpg URL built from ``DB_*``."""
+    url = os.getenv("SPIDER_DATABASE_URL")
+    if url:
+        return url
+    return (
+        f"postgresql+asyncpg://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}"
+        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('SPIDER_DB_NAME')}"
+    )
+
+
+def pool_options(url: str) -> dict:
+    """Pool sizing from ``DB_POOL_*``; SQLite keeps SQLAlchemy's defaults."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", 5)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": True,
+    }
+
+
+def configure_engine(url: Optional[str] = None, **engine_kwargs) -> AsyncEngine:
+    """Replace the shared engine, e.g. with an SQLite one in tests."""
+    global _engine, _session_factory, _tables_created
+    url = url or database_url()
+    _engine = create_async_engine(url, **{**pool_options(url), **engine_kwargs})
+    _session_factory = async_sessionmaker(_engine, expire_on_commit=False)
+    _tables_created = False
+    return _engine
+
+
+def get_engine() -> AsyncEngine:
+    """The shared engine, created on first use rather than at import."""
+    if _engine is None:
+        configure_engine()
+    return _engine
+
+
+def _add_missing_columns(connection):
+    # create_all skips existing tables, so nullable columns added to a model
+    # later are added here instead, with their indexes
+    inspector = inspect(connection)
+    for table in BaseModel.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(connection.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+async def create_tables():
+    global _tables_created
+    # loads of several apps start at once, only one may create the tables
+    async with _tables_lock:
+        if not _tables_created:
+            async with get_engine().begin() as connection:
+                await connection.run_sync(BaseModel.metadata.create_all)
+                await connection.run_sync(_add_missing_columns)
+            _tables_created = True
+
+
+@asynccontextmanager
+async def get_async_session():
+    get_engine()
+    async with _session_factory() as session:
+        yield session
+
+
+@asynccontextmanager
+async def transaction():
+    """A session inside one transaction, committed on exit."""
+    async with get_async_session() as session, session.begin():
+        yield session
+
+
+async def dispose_engine():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = _session_factory = None
@@ -0,0 +1,27 @@
+import hashlib
+import re
+import unicodedata
+from typing import Optional
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_content(text: Optional[str]) -> str:
+    """Review text folded so trivially different duplicates compare equal.
+
+    NFKC folds compatibility forms (full-width letters, ligatures), casefold
+    handles case, and runs of whitespace collapse to one space. Punctuation
+    and emoji are kept, they change the sentiment of short reviews.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def text_hash(text: Optional[str]) -> Optional[str]:
+    """SHA-256 of the normalised text, None for reviews without any."""
+    normalized = normalize_content(text)
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from Spiders.PlayStoreScraper.play_store_scraper import ContinuationToken
+from Spiders.PlayStoreScraper.review_decoder import ReviewRecord
+
+Page = Tuple[List[ReviewRecord], ContinuationToken]
+_DONE = object()
+
+
+@dataclass
+class PipelineStats:
+    pages: int = 0
+    reviews: int = 0
+    committed_pages: int = 0
+    wall: float = 0.0
+    # time each stage spent working, summed over its workers
+    busy: Dict[str, float] = field(
+        default_factory=lambda: {"fetch": 0.0, "analyze": 0.0, "store": 0.0}
+    )
+
+
+class ReviewPipeline:
+    """Fetch, analyze and store review pages as overlapping stages.
+
+    Stages are joined by bounded queues, so a slow stage holds back the ones
+    before it instead of letting pages pile up in memory. ``analyze`` and
+    ``store`` run on ``analyze_concurrency``/``store_concurrency`` workers
+    and may finish pages out of order; ``on_committed`` is still called in
+    page order, once per page, as soon as every earlier page is stored, so a
+    checkpoint never skips over a page that failed.
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[List[ReviewRecord]], Awaitable],
+        store: Callable[[List[ReviewRecord]], Awaitable],
+        on_committed: Optional[Callable[[int, Page], Awaitable]] = None,
+        queue_size: int = 2,
+        analyze_concurrency: int = 2,
+        store_concurrency: int = 1,
+    ):
+        self.analyze = analyze
+        self.store = store
+        self.on_committed = on_committed
+        self.queue_size = queue_size
+        self.analyze_concurrency = analyze_concurrency
+        self.store_concurrency = store_concurrency
+
+    async def run(self, pages: AsyncIterator[Page]) -> PipelineStats:
+        stats = PipelineStats()
+        analyze_queue = asyncio.Queue(self.queue_size)
+        store_queue = asyncio.Queue(self.queue_size)
+        stored = {}
+        next_commit = 0
+        commit_lock = asyncio.Lock()
+
+        async def fetch():
+            seq = 0
+            iterator = pages.__aiter__()
+            while True:
+                started = time.perf_counter()
+                try:
+                    page = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    stats.busy["fetch"] += time.perf_counter() - started
+                stats.pages += 1
+                stats.reviews += len(page[0])
+                await analyze_queue.put((seq, page))
+                seq += 1
+            for _ in range(self.analyze_concurrency):
+                await analyze_queue.put(_DONE)
+
+        async def analyze():
+            while (item := await analyze_queue.get()) is not _DONE:
+                started = time.perf_counter()
+                await self.analyze(item[1][0])
+                stats.busy["analyze"] += time.perf_counter() - started
+                await store_queue.put(item)
+
+        async def store():
+            nonlocal next_commit
+            while (item := await store_queue.get()) is not _DONE:
+                seq, page = item
+                started = time.perf_counter()
+                await self.store(page[0])
+                stats.busy["store"] += time.perf_counter() - started
+                async with commit_lock:
+                    stored[seq] = page
+                    while next_commit in stored:
+                        if self.on_committed is not None:
+                            await self.on_committed(next_commit, stored[next_commit])
+                        del stored[next_commit]
+                        next_commit += 1
+                        stats.committed_pages += 1
+
+        async def analyze_stage():
+            await asyncio.gather(
+                *(analyze() for _ in range(self.analyze_concurrency))
+            )
+            for _ in range(self.store_concurrency):
+                await store_queue.put(_DONE)
+
+        started = time.perf_counter()
+        tasks = [
+            asyncio.ensure_future(fetch()),
+            asyncio.ensure_future(analyze_stage()),
+            *(asyncio.ensure_future(store()) for _ in range(self.store_concurrency)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # one failed stage would leave the others blocked on their queues
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            stats.wall = time.perf_counter() - started
+        return stats
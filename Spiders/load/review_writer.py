@@ -0,0 +1,243 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+from uuid import UUID
+
+from sqlalchemy import case, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Spiders.load.normalize import text_hash
+from Spiders.models.spider_models.models import AppReviewsModel
+from Spiders.PlayStoreScraper.review_decoder import ReviewRecord
+
+REVIEW_COLUMNS = (
+    "app_id",
+    "app_country",
+    "review_id",
+    "user_name",
+    "content",
+    "content_hash",
+    "ratings",
+    "thumbs_up_count",
+    "review_created_at",
+    "review_created_version",
+    "review_reply",
+    "reply_time",
+    "current_app_version",
+)
+# an edit of any of these columns updates the stored review
+CHANGE_COLUMNS = ("content_hash", "ratings", "review_reply")
+STAGE_TABLE = "app_reviews_stage"
+# insert constructor and bind parameter limit of each ON CONFLICT dialect
+_UPSERT_DIALECTS = {"postgresql": (pg_insert, 32767), "sqlite": (sqlite_insert, 32766)}
+_COLUMN_LIST = ", ".join(REVIEW_COLUMNS)
+_REVIEW_ID = REVIEW_COLUMNS.index("review_id")
+_CONTENT_HASH = REVIEW_COLUMNS.index("content_hash")
+_CHANGE_INDEXES = [REVIEW_COLUMNS.index(column) for column in CHANGE_COLUMNS]
+
+
+def review_row(review: ReviewRecord, app_id: str, country: str) -> tuple:
+    """``review`` as a tuple in ``REVIEW_COLUMNS`` order."""
+    return (
+        app_id,
+        country,
+        UUID(review.review_id),
+        review.user_name,
+        review.content,
+        text_hash(review.content),
+        review.score,
+        review.thumbs_up_count or 0,
+        review.at,
+        review.review_created_version,
+        review.reply_content,
+        review.replied_at,
+        review.app_version,
+    )
+
+
+@dataclass
+class WriteResult:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    # unedited legacy rows that only had their content_hash written
+    backfilled: int = 0
+    seconds: float = 0.0
+    method: str = ""
+    # ids of updated reviews whose text changed, their sentiment is stale
+    rescore: List[str] = field(default_factory=list)
+
+    @property
+    def skipped(self) -> int:
+        return self.rows - self.inserted - self.updated
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class ReviewWriter:
+    """Writes decoded review pages into ``app_reviews`` in bulk.
+
+    The stored version of the page's reviews is looked up first. New reviews
+    are written with ``method``: ``copy`` (asyncpg COPY into a temporary
+    staging table, then ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``),
+    ``insert`` (multi-row ``INSERT ... ON CONFLICT DO NOTHING``, PostgreSQL
+    or SQLite) or ``orm`` (one ``AppReviewsModel`` each). ``auto`` picks
+    ``copy`` on PostgreSQL with asyncpg, ``insert`` on other PostgreSQL
+    drivers and SQLite, and ``orm`` elsewhere.
+
+    Stored reviews whose ``CHANGE_COLUMNS`` differ were edited by their
+    author and are updated with one bulk UPDATE; the rest are skipped, so
+    writes are idempotent. Unedited rows stored before ``content_hash``
+    existed only get their hash written and are not counted as updated. The
+    writer does not commit; the caller owns the transaction.
+    """
+
+    def __init__(self, method: str = "auto"):
+        if method not in ("auto", "copy", "insert", "orm"):
+            raise ValueError(f"Unknown review write method {method!r}")
+        self.method = method
+
+    def _method_for(self, session: AsyncSession) -> str:
+        if self.method != "auto":
+            return self.method
+        dialect = session.get_bind().dialect
+        if dialect.name == "postgresql" and dialect.driver == "asyncpg":
+            return "copy"
+        return "insert" if dialect.name in _UPSERT_DIALECTS else "orm"
+
+    async def write(
+        self,
+        session: AsyncSession,
+        reviews: Iterable[ReviewRecord],
+        app_id: str,
+        country: str,
+    ) -> WriteResult:
+        started = time.perf_counter()
+        rows = [review_row(review, app_id, country) for review in reviews]
+        result = WriteResult(rows=len(rows), method=self._method_for(session))
+        unique = {row[_REVIEW_ID]: row for row in rows}
+        stored = await self._stored(session, list(unique))
+        new, changed, unhashed = [], [], []
+        for review_id, row in unique.items():
+            if review_id not in stored:
+                new.append(row)
+            elif stored[review_id][1] != tuple(row[i] for i in _CHANGE_INDEXES):
+                changed.append(row)
+            elif stored[review_id][0]:
+                unhashed.append(row)
+        if new:
+            write = getattr(self, f"_write_{result.method}")
+            result.inserted = await write(session, new)
+        if changed:
+            result.updated = await self._update(session, changed)
+            result.rescore = [
+                str(row[_REVIEW_ID])
+                for row in changed
+                if stored[row[_REVIEW_ID]][1][0] != row[_CONTENT_HASH]
+            ]
+        if unhashed:
+            result.backfilled = await self._backfill_hashes(session, unhashed)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    async def _stored(self, session: AsyncSession, review_ids: List[UUID]) -> Dict:
+        """Whether the stored ``review_ids`` lack a content hash, and their
+        ``CHANGE_COLUMNS`` with the hash of their text in its place if so.
+        """
+        if not review_ids:
+            return {}
+        # rows stored before content_hash existed send their text to hash here
+        legacy_content = case(
+            (AppReviewsModel.content_hash.is_(None), AppReviewsModel.content)
+        )
+        rows = await session.execute(
+            select(
+                AppReviewsModel.review_id,
+                legacy_content,
+                *(getattr(AppReviewsModel, column) for column in CHANGE_COLUMNS),
+            ).where(AppReviewsModel.review_id.in_(review_ids))
+        )
+        stored = {}
+        for review_id, legacy, content_hash, *values in rows:
+            if content_hash is None:
+                content_hash = text_hash(legacy)
+                stored[review_id] = (content_hash is not None, (content_hash, *values))
+            else:
+                stored[review_id] = (False, (content_hash, *values))
+        return stored
+
+    async def _update(self, session: AsyncSession, rows: List[tuple]) -> int:
+        now = datetime.now(timezone.utc)
+        await session.execute(
+            update(AppReviewsModel),
+            [{**dict(zip(REVIEW_COLUMNS, row)), "updated_at": now} for row in rows],
+        )
+        return len(rows)
+
+    async def _backfill_hashes(self, session: AsyncSession, rows: List[tuple]) -> int:
+        # not an edit, updated_at stays as it was
+        await session.execute(
+            update(AppReviewsModel),
+            [
+                {"review_id": row[_REVIEW_ID], "content_hash": row[_CONTENT_HASH]}
+                for row in rows
+            ],
+        )
+        return len(rows)
+
+    async def _write_copy(self, session: AsyncSession, rows: List[tuple]) -> int:
+        # statements go through the session so COPY runs in its transaction
+        await session.execute(
+            text(
+                f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} "
+                "ON COMMIT DELETE ROWS "
+                f"AS SELECT {_COLUMN_LIST} FROM {AppReviewsModel.__tablename__} "
+                "WITH NO DATA"
+            )
+        )
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            STAGE_TABLE, records=rows, columns=REVIEW_COLUMNS
+        )
+        result = await session.execute(
+            text(
+                f"INSERT INTO {AppReviewsModel.__tablename__} "
+                f"({_COLUMN_LIST}, added_at) "
+                f"SELECT DISTINCT ON (review_id) {_COLUMN_LIST}, now() "
+                f"FROM {STAGE_TABLE} ON CONFLICT (review_id) DO NOTHING"
+            )
+        )
+        # a later page of the same transaction must not insert these again
+        await session.execute(text(f"TRUNCATE {STAGE_TABLE}"))
+        return result.rowcount
+
+    async def _write_insert(self, session: AsyncSession, rows: List[tuple]) -> int:
+        insert, max_params = _UPSERT_DIALECTS[session.get_bind().dialect.name]
+        batch = max_params // (len(REVIEW_COLUMNS) + 1)  # + added_at
+        inserted = 0
+        for start in range(0, len(rows), batch):
+            statement = (
+                insert(AppReviewsModel)
+                .values(
+                    [
+                        dict(zip(REVIEW_COLUMNS, row))
+                        for row in rows[start : start + batch]
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=["review_id"])
+            )
+            inserted += (await session.execute(statement)).rowcount
+        return inserted
+
+    async def _write_orm(self, session: AsyncSession, rows: List[tuple]) -> int:
+        session.add_all(
+            AppReviewsModel(**dict(zip(REVIEW_COLUMNS, row))) for row in rows
+        )
+        await session.flush()
+        return len(rows)
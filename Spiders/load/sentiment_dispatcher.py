@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Iterable, List, Optional
+from uuid import UUID
+
+import httpx
+from sqlalchemy import Uuid, column, inspect, select, table
+from sqlalchemy.exc import SQLAlchemyError
+
+from Spiders.load.normalize import text_hash
+from Spiders.PlayStoreScraper.review_decoder import ReviewRecord
+from Spiders.PlayStoreScraper.throttle import backoff_delay
+
+# rows written by the sentiment service's Celery worker
+review_sentiments = table("review_sentiments", column("review_id", Uuid))
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_ENVELOPE_BYTES = len('{"reviews":[]}')
+
+
+def _has_sentiments_table(session) -> bool:
+    return inspect(session.connection()).has_table(review_sentiments.name)
+
+
+class _RecentIds:
+    """The last ``capacity`` review ids added, kept as 16 byte UUID keys."""
+
+    __slots__ = ("capacity", "_keys")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys = {}
+
+    def __contains__(self, review_id: str) -> bool:
+        return UUID(review_id).bytes in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, review_id: str):
+        self._keys[UUID(review_id).bytes] = None
+        if len(self._keys) > self.capacity:
+            # dicts keep insertion order, the oldest id goes
+            del self._keys[next(iter(self._keys))]
+
+
+class SentimentDispatcher:
+    """Sends reviews to the sentiment service in right-sized batches.
+
+    :meth:`submit` drops reviews without text, reviews among the last
+    ``max_remembered`` sent in this run and, when ``session_factory`` is
+    given, reviews that already have a ``review_sentiments`` row; when that
+    lookup fails the page is sent unfiltered and the service overwrites the
+    scores. The rest are coalesced across pages into POSTs of at most
+    ``max_reviews`` reviews and ``max_bytes`` of JSON, sent in the
+    background with retries. :meth:`rescore` queues edited reviews even
+    though they were scored before. :meth:`close` flushes the last batch and
+    returns the Celery task ids of every batch, which are also kept in
+    :attr:`task_ids`.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        session_factory: Optional[Callable] = None,
+        max_reviews: int = 1000,
+        max_bytes: int = 1 << 20,
+        max_in_flight: int = 2,
+        max_retries: int = 5,
+        retry_delay: float = 1.0,
+        timeout: float = 100,
+        max_remembered: int = 100_000,
+    ):
+        self.client = client
+        self.url = url
+        self.session_factory = session_factory
+        self.max_reviews = max_reviews
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.task_ids: List[str] = []
+        self.sent = 0
+        self.filtered = 0
+        self.rescored = 0
+        self._table_checked = False
+        self._seen = _RecentIds(max_remembered)
+        self._queued = _RecentIds(max_remembered)
+        self._batch: List[dict] = []
+        self._batch_bytes = _ENVELOPE_BYTES
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._sends = set()
+        self._errors: List[BaseException] = []
+
+    async def _scored(self, review_ids: List[str]) -> set:
+        if self.session_factory is None or not review_ids:
+            return set()
+        try:
+            async with self.session_factory() as session:
+                if not self._table_checked:
+                    # the service owns the table, it may not exist here yet
+                    if not await session.run_sync(_has_sentiments_table):
+                        logging.warning(
+                            "No review_sentiments table, not filtering scored reviews"
+                        )
+                        self.session_factory = None
+                        return set()
+                    self._table_checked = True
+                rows = await session.scalars(
+                    select(review_sentiments.c.review_id).where(
+                        review_sentiments.c.review_id.in_([UUID(i) for i in review_ids])
+                    )
+                )
+                return {str(review_id) for review_id in rows}
+        except (SQLAlchemyError, OSError) as e:
+            # a transient failure costs this page its filtering, not the run
+            logging.warning(
+                f"Not filtering scored reviews of a page: {getattr(e, 'orig', e)}"
+            )
+            return set()
+
+    async def submit(self, reviews: Iterable[ReviewRecord]):
+        self._raise_failed()
+        fresh = []
+        for review in reviews:
+            digest = text_hash(review.content)
+            if digest is None or review.review_id in self._seen:
+                self.filtered += 1
+                continue
+            self._seen.add(review.review_id)
+            fresh.append((review, digest))
+        scored = await self._scored([review.review_id for review, _ in fresh])
+        self.filtered += len(scored)
+        for review, digest in fresh:
+            if review.review_id not in scored:
+                await self._add(review, digest)
+        if len(self._batch) >= self.max_reviews:
+            await self._flush()
+
+    async def written(
+        self, app_id: str, country: str, reviews: List[ReviewRecord], result
+    ):
+        """Send reviews once stored, and their edits in ``result.rescore``.
+
+        The ``on_written`` callback of a spool drainer.
+        """
+        await self.submit(reviews)
+        if result.rescore:
+            rescore = set(result.rescore)
+            await self.rescore(
+                review for review in reviews if review.review_id in rescore
+            )
+
+    async def rescore(self, reviews: Iterable[ReviewRecord]):
+        """Send reviews whose text was edited, although they were scored."""
+        self._raise_failed()
+        for review in reviews:
+            digest = text_hash(review.content)
+            if digest is not None and review.review_id not in self._queued:
+                self.rescored += 1
+                await self._add(review, digest)
+
+    async def _add(self, review: ReviewRecord, digest: str):
+        self._queued.add(review.review_id)
+        # the service analyses each distinct content_hash once
+        item = {
+            "review_id": review.review_id,
+            "review_text": review.content,
+            "content_hash": digest,
+        }
+        size = len(json.dumps(item)) + 1
+        if self._batch and (
+            len(self._batch) >= self.max_reviews
+            or self._batch_bytes + size > self.max_bytes
+        ):
+            await self._flush()
+        self._batch.append(item)
+        self._batch_bytes += size
+
+    async def _flush(self):
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        self._batch_bytes = _ENVELOPE_BYTES
+        # waits here once max_in_flight batches are being sent
+        await self._slots.acquire()
+        task = asyncio.ensure_future(self._send(batch))
+        self._sends.add(task)
+        task.add_done_callback(self._sent)
+
+    def _sent(self, task: asyncio.Task):
+        self._sends.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            self._errors.append(task.exception())
+
+    def _raise_failed(self):
+        if self._errors:
+            raise self._errors[0]
+
+    async def _send(self, batch: List[dict]):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                response = await self.client.post(
+                    self.url, json={"reviews": batch}, timeout=self.timeout
+                )
+                if response.status_code not in _RETRY_STATUSES:
+                    response.raise_for_status()
+                    self.task_ids.append(response.json()["task_id"])
+                    self.sent += len(batch)
+                    return
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = repr(e)
+            if attempt == self.max_retries:
+                raise RuntimeError(
+                    f"Sentiment batch of {len(batch)} reviews failed: {error}"
+                )
+            delay = backoff_delay(attempt, self.retry_delay)
+            logging.warning(f"Sentiment batch failed ({error}), retry in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def close(self) -> List[str]:
+        await self._flush()
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+        self._raise_failed()
+        return self.task_ids
+
+
+def dispatcher_from_env(
+    client: httpx.AsyncClient, session_factory: Optional[Callable] = None
+) -> SentimentDispatcher:
+    """A dispatcher for the service at ``MICRO_HOST``/``ANALYSIS_PATH``.
+
+    ``SENTIMENT_BATCH_SIZE`` and ``SENTIMENT_BATCH_BYTES`` bound its batches.
+    """
+    return SentimentDispatcher(
+        client,
+        f"{os.getenv('MICRO_HOST')}/{os.getenv('ANALYSIS_PATH')}/",
+        session_factory=session_factory,
+        max_reviews=int(os.getenv("SENTIMENT_BATCH_SIZE", 1000)),
+        max_bytes=int(os.getenv("SENTIMENT_BATCH_BYTES", 1 << 20)),
+    )
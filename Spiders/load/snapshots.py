@@ -0,0 +1,48 @@
+import hashlib
+import json
+from typing import List
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def content_hash(rows: List[dict]) -> str:
+    """Stable SHA-256 of a snapshot's column values."""
+    payload = json.dumps(rows, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def save_snapshot(
+    session: AsyncSession, model, app_id: str, country: str, rows: List[dict]
+) -> bool:
+    """Store ``rows`` as a new snapshot of ``model`` only if they changed.
+
+    A snapshot is every row written for an app by one run (one details row,
+    five histogram rows). When the latest snapshot has the same content hash
+    its rows just get a fresh ``last_seen_at``. Returns True when new rows
+    were added.
+    """
+    digest = content_hash(rows)
+    of_app = and_(model.app_id == app_id, model.app_country == country)
+    # the latest snapshot is the newest len(rows) rows; a snapshot of another
+    # size has another hash anyway
+    latest = (
+        await session.execute(
+            select(model.ID, model.content_hash)
+            .where(of_app)
+            .order_by(model.added_at.desc(), model.ID.desc())
+            .limit(len(rows))
+        )
+    ).all()
+    if latest and all(row.content_hash == digest for row in latest):
+        await session.execute(
+            update(model)
+            .where(model.ID.in_([row.ID for row in latest]))
+            .values(last_seen_at=func.now())
+        )
+        return False
+    session.add_all(
+        model(app_id=app_id, app_country=country, content_hash=digest, **row)
+        for row in rows
+    )
+    return True
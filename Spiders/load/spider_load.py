@@ -2,111 +2,59 @@ import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
+from datetime import date, datetime
 from pathlib import Path
-from typing import List
-from uuid import UUID
+from typing import Callable, List, Optional
 
 import httpx
 from dotenv import load_dotenv
-from sqlalchemy import and_, create_engine, select
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import and_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from Spiders.load.checkpoints import (CheckpointStore, CrawlCheckpoint,
+                                      DatabaseCheckpointStore,
+                                      FileCheckpointStore)
+from Spiders.load.database import (create_tables, get_async_session,
+                                   transaction)
+from Spiders.load.pipeline import ReviewPipeline
+from Spiders.load.review_writer import ReviewWriter, WriteResult
+from Spiders.load.sentiment_dispatcher import (SentimentDispatcher,
+                                               dispatcher_from_env)
+from Spiders.load.snapshots import save_snapshot
+from Spiders.load.spool import ReviewSpool, SpoolDrainer, spool_name
+from Spiders.load.watermarks import (load_watermark, newest_review,
+                                     page_is_older, save_watermark)
 from Spiders.models.spider_models.models import (AppDetailsModel,
                                                  AppDeveloperDetailsModel,
                                                  AppInfoModel,
-                                                 AppRatingsHistogramModel,
-                                                 AppReviewsModel, BaseModel)
+                                                 AppRatingsHistogramModel)
+from Spiders.PlayStoreScraper.constants import play_store_enums
+from Spiders.PlayStoreScraper.crawler import (SCORE_SHARDS, CrawlJob,
+                                              ReviewCrawler)
 from Spiders.PlayStoreScraper.play_store_scraper import (PlayStoreAppDetails,
                                                          PlayStoreReviews)
+from Spiders.PlayStoreScraper.review_decoder import ReviewRecord
 
 logging.basicConfig(level=logging.INFO)
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 load_dotenv(BASE_DIR / ".env")
-HOST = os.getenv("DB_HOST")
-PORT = os.getenv("DB_PORT")
-DATABASE = os.getenv("SPIDER_DB_NAME")
-DB_USER = os.getenv("DB_USERNAME")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-MICRO_HOST = os.getenv("MICRO_HOST")  # Microservice host address
-ANALYSIS_PATH = os.getenv("ANALYSIS_PATH")  # Microservice path to analysis
-DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{HOST}:{PORT}/{DATABASE}"
-ASYNC_DB_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{HOST}:{PORT}/{DATABASE}"
-engine = create_engine(DATABASE_URL)
-async_engine = create_async_engine(ASYNC_DB_URL)
-AsyncSessionLocal = sessionmaker(
-    async_engine, class_=AsyncSession, expire_on_commit=False
-)
-BaseModel.metadata.create_all(engine)
+# pages buffered between pipeline stages and workers per stage
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 2))
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", 2))
+STORE_CONCURRENCY = int(os.getenv("STORE_CONCURRENCY", 1))
+review_writer = ReviewWriter(os.getenv("REVIEW_WRITE_METHOD", "auto"))
+# pages are spooled here first and drained into the database when it is set
+REVIEW_SPOOL_DIR = os.getenv("REVIEW_SPOOL_DIR")
 
 
-@asynccontextmanager
-async def get_async_session():
-    async with AsyncSessionLocal() as session:
-        yield session
-
-
-def load_app_details(session, app_id, lang, country):
+async def load_app_details(app_id, lang, country):
     try:
         app = PlayStoreAppDetails()
-        details = app.app(app_id, lang, country)
-        existing_app = session.execute(
-            select(AppInfoModel).where(
-                and_(
-                    AppInfoModel.app_id == app_id,
-                    AppInfoModel.language == lang,
-                )
-            )
-        ).scalar()
-        # adding app information
-        if not existing_app:
-            app_info = AppInfoModel(
-                app_id=app_id,
-                country=country,
-                language=lang,
-                app_name=details.get("title"),
-                url=details.get("url"),
-                app_description=details.get("description"),
-                summary=details.get("summary"),
-                released_at=details.get("released"),
-                icon_url=details.get("icon"),
-                genre=details.get("genre"),
-            )
-            session.add(app_info)
-        app_details = AppDetailsModel(
-            app_id=app_id,
-            app_country=country,
-            total_app_installs=details.get("installs"),
-            avg_rating=details.get("score"),
-            installs=details.get("minInstalls"),
-            real_installs=details.get("realInstalls"),
-            ratings_count=details.get("ratings"),
-            reviews_count=details.get("reviews"),
-            version=details.get("version"),
-            last_updated=details.get("lastUpdatedOn"),
-        )
-        session.add(app_details)
-        for i, rating_cnt in enumerate(details.get("histogram"), 1):
-            ratings_histogram = AppRatingsHistogramModel(
-                app_id=app_id,
-                app_country=country,
-                rating_star=i,
-                ratings_count=rating_cnt,
-            )
-            session.add(ratings_histogram)
-
-        developer_model = AppDeveloperDetailsModel(
-            app_id=app_id,
-            app_country=country,
-            developer_id=details.get("developerId"),
-            developer=details.get("developer"),
-            developer_email=details.get("developerEmail"),
-            developer_website=details.get("developerWebsite"),
-            developer_address=details.get("developerAddress"),
-        )
-        session.add(developer_model)
-        session.commit()
+        details = await app.aapp(app_id, lang, country)
+        async with transaction() as session:
+            await save_app_details(session, details, app_id, lang, country)
     except Exception as e:
         logging.error(e)
         return False
@@ -114,106 +62,370 @@ def load_app_details(session, app_id, lang, country):
         return True
 
 
-def analysis_app_reviews(reviews):
-    return [
-        {"review_id": review.get("reviewId"), "review_text": review.get("content")}
-        for review in reviews
-    ]
+def parse_store_date(value) -> Optional[date]:
+    # asyncpg binds DATE strictly, the "Mar 1, 2011" text is not cast for us
+    try:
+        return datetime.strptime(value, "%b %d, %Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+async def save_app_details(session: AsyncSession, details, app_id, lang, country):
+    existing_app = await session.scalar(
+        select(AppInfoModel).where(
+            and_(
+                AppInfoModel.app_id == app_id,
+                AppInfoModel.language == lang,
+            )
+        )
+    )
+    # adding app information
+    if not existing_app:
+        app_info = AppInfoModel(
+            app_id=app_id,
+            country=country,
+            language=lang,
+            app_name=details.get("title"),
+            url=details.get("url"),
+            app_description=details.get("description"),
+            summary=details.get("summary"),
+            released_at=parse_store_date(details.get("released")),
+            icon_url=details.get("icon"),
+            genre=details.get("genre"),
+        )
+        session.add(app_info)
+    # snapshots are only written when their values changed since the last run
+    await save_snapshot(
+        session,
+        AppDetailsModel,
+        app_id,
+        country,
+        [
+            dict(
+                total_app_installs=details.get("installs"),
+                avg_rating=details.get("score"),
+                installs=details.get("minInstalls"),
+                real_installs=details.get("realInstalls"),
+                ratings_count=details.get("ratings"),
+                reviews_count=details.get("reviews"),
+                version=details.get("version"),
+                last_updated=parse_store_date(details.get("lastUpdatedOn")),
+            )
+        ],
+    )
+    await save_snapshot(
+        session,
+        AppRatingsHistogramModel,
+        app_id,
+        country,
+        [
+            dict(rating_star=i, ratings_count=rating_cnt)
+            for i, rating_cnt in enumerate(details.get("histogram"), 1)
+        ],
+    )
+    await save_snapshot(
+        session,
+        AppDeveloperDetailsModel,
+        app_id,
+        country,
+        [
+            dict(
+                developer_id=details.get("developerId"),
+                developer=details.get("developer"),
+                developer_email=details.get("developerEmail"),
+                developer_website=details.get("developerWebsite"),
+                developer_address=details.get("developerAddress"),
+            )
+        ],
+    )
 
 
 async def save_reviews_async(
-    reviews: List[dict],
+    reviews: List[ReviewRecord],
     app_id: str,
     country: str,
-    latest_review_ids: set,
     session: AsyncSession,
+) -> WriteResult:
+    return await review_writer.write(session, reviews, app_id, country)
+
+
+async def store_reviews_async_way(reviews, app_id, country) -> WriteResult:
+    # one transaction per page
+    async with transaction() as session:
+        result = await save_reviews_async(reviews, app_id, country, session)
+    logging.info(
+        f"Wrote {result.inserted} new and {result.updated} edited of "
+        f"{result.rows} reviews of {app_id} ({country}) via {result.method} "
+        f"at {result.rows_per_second:.0f} rows/s"
+    )
+    return result
+
+
+def sentiment_dispatcher(client: httpx.AsyncClient) -> SentimentDispatcher:
+    return dispatcher_from_env(client, session_factory=get_async_session)
+
+
+async def close_dispatcher(dispatcher: SentimentDispatcher, app_id, country):
+    task_ids = await dispatcher.close()
+    logging.info(
+        f"Sent {dispatcher.sent} reviews of {app_id} ({country}) for analysis in "
+        f"{len(task_ids)} tasks, {dispatcher.filtered} filtered out, "
+        f"{dispatcher.rescored} edited"
+    )
+    return task_ids
+
+
+async def rescore_edited(
+    dispatcher: SentimentDispatcher, reviews: List[ReviewRecord], result: WriteResult
 ):
-    flag = False
-    for review in reviews:
-        if UUID(review.get("reviewId")) in latest_review_ids:
-            flag = True
-            continue
-        review_model = AppReviewsModel(
-            app_id=app_id,
-            app_country=country,
-            review_id=UUID(review.get("reviewId")),
-            user_name=review.get("userName"),
-            content=review.get("content"),
-            ratings=review.get("score"),
-            thumbs_up_count=review.get("thumbsUpCount"),
-            review_created_at=review.get("at"),
-            review_created_version=review.get("reviewCreatedVersion"),
-            review_reply=review.get("replyContent"),
-            reply_time=review.get("repliedAt"),
-            current_app_version=review.get("appVersion"),
+    if result.rescore:
+        # edited texts were filtered as already scored before the store
+        rescore = set(result.rescore)
+        await dispatcher.rescore(
+            review for review in reviews if review.review_id in rescore
         )
-        session.add(review_model)
 
-    await session.commit()
-    return flag
 
+async def store_review_page(
+    dispatcher: SentimentDispatcher, reviews: List[ReviewRecord], app_id, country
+):
+    result = await store_reviews_async_way(reviews, app_id, country)
+    await rescore_edited(dispatcher, reviews, result)
 
-async def store_reviews_async_way(reviews, app_id, country, latest_review_ids):
-    async with get_async_session() as session:
-        return await save_reviews_async(
-            reviews, app_id, country, latest_review_ids, session
-        )
 
+@asynccontextmanager
+async def review_stages(dispatcher: SentimentDispatcher, app_id, country):
+    """The pipeline's analyze and store stages for one app.
+
+    Pages are sent for analysis and written straight to the database, or
+    with ``REVIEW_SPOOL_DIR`` appended to a local spool that a background
+    :class:`SpoolDrainer` replays into it. Spooled pages are sent for
+    analysis by the drainer once they are written, as the scored-review
+    lookup needs the database too, so a slow or unavailable database does
+    not hold up the crawl. The spool is drained before the context exits;
+    what cannot be written stays on disk for the next load of the app or
+    ``python -m Spiders.load.spool``.
+    """
+    if not REVIEW_SPOOL_DIR:
 
-async def load_app_reviews(app_id, lang, country, sync_session):
+        async def store(reviews):
+            await store_review_page(dispatcher, reviews, app_id, country)
+
+        yield dispatcher.submit, store
+        return
+
+    async def analyze(reviews):
+        pass  # on_written sends the pages once they are in the database
+
+    async def store(reviews):
+        await asyncio.to_thread(spool.append, app_id, country, reviews)
+
+    spool = ReviewSpool(Path(REVIEW_SPOOL_DIR) / spool_name(app_id, country)).open()
+    stop = asyncio.Event()
+    draining = asyncio.ensure_future(
+        SpoolDrainer(spool, review_writer, dispatcher.written).run(stop)
+    )
+    try:
+        yield analyze, store
+    finally:
+        await asyncio.to_thread(spool.seal)
+        stop.set()
+        try:
+            await draining
+        finally:
+            spool.close()
+
+
+async def process_review_page(
+    dispatcher: SentimentDispatcher, reviews, token, app_id, country
+):
+    logging.info(f"Fetched {len(reviews)} reviews of {app_id} ({country})")
+    await dispatcher.submit(reviews)
+    await store_review_page(dispatcher, reviews, app_id, country)
+
+
+async def load_app_reviews(
+    app_id,
+    lang,
+    country,
+    checkpoint_store: Optional[CheckpointStore] = None,
+    resume: bool = False,
+    incremental: bool = False,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    analyze_concurrency: int = ANALYZE_CONCURRENCY,
+    store_concurrency: int = STORE_CONCURRENCY,
+    task_ids: Optional[List[str]] = None,
+    on_page: Optional[Callable[[int], None]] = None,
+):
+    """Crawl reviews newest first and store them page by page.
+
+    Fetching, analysis and storage overlap through a :class:`ReviewPipeline`
+    with ``queue_size`` pages buffered between stages. Reviews go to the
+    sentiment service through a :class:`SentimentDispatcher`; the ids of its
+    Celery tasks are appended to ``task_ids`` when it is given, and
+    ``on_page`` is called with the review count of every stored page.
+
+    With ``incremental`` the crawl stops at the first page that is entirely
+    older than the app's watermark, so a daily refresh costs a page or two.
+    Checkpoints are neither read nor written in that mode, so the resume
+    point of an interrupted full backfill survives the refresh.
+    """
+    if incremental:
+        checkpoint_store = None
     try:
         app_reviews = PlayStoreReviews()
-        latest_review_ids = sync_session.execute(
-            select(AppReviewsModel.review_id).where(
-                and_(
-                    AppReviewsModel.app_id == app_id,
-                    AppReviewsModel.app_country == country,
-                )
+        try:
+            watermark = await load_watermark(get_async_session, app_id, country)
+        except (SQLAlchemyError, OSError) as e:
+            # a spooled crawl goes on without the database, from the top
+            logging.warning(
+                f"No watermark for {app_id} ({country}): {getattr(e, 'orig', e)}"
             )
-        ).all()
-        latest_review_ids = set(
-            latest_review_id[0] for latest_review_id in latest_review_ids
-        )
+            watermark = None
+        newest = watermark
+        checkpoint = None
+        if resume and checkpoint_store is not None:
+            checkpoint = await checkpoint_store.load(app_id, country)
+        if checkpoint is not None:
+            logging.info(
+                f"Resuming {app_id} ({country}) after page {checkpoint.pages}, "
+                f"{checkpoint.reviews} reviews already stored"
+            )
+        else:
+            checkpoint = CrawlCheckpoint(app_id, country, token=None)
 
-        token = None
-        while reviews := app_reviews.reviews(
-            app_id, lang, country, continuation_token=token, count=500
-        ):
-            reviews, token = reviews
-            analysis_reviews = analysis_app_reviews(reviews)
-            with httpx.Client() as client:
-                response = client.post(
-                    f"{MICRO_HOST}/{ANALYSIS_PATH}/",
-                    json={"reviews": analysis_reviews},
-                    timeout=100,
+        async def pages():
+            nonlocal newest
+            async for reviews, token in app_reviews.aiter_pages(
+                app_id,
+                lang,
+                country,
+                play_store_enums.Sort.NEWEST,
+                count=500,
+                continuation_token=checkpoint.token,
+            ):
+                if incremental and page_is_older(reviews, watermark):
+                    logging.info(f"Reached the watermark of {app_id} ({country})")
+                    break
+                newest = newest_review(reviews, newest)
+                logging.info(f"Fetched {len(reviews)} reviews of {app_id} ({country})")
+                yield reviews, token
+
+        async def on_committed(seq, page):
+            if on_page is not None:
+                on_page(len(page[0]))
+            if checkpoint_store is not None:
+                # every page up to this one is stored, the next starts here
+                reviews, token = page
+                checkpoint.token = token
+                checkpoint.pages += 1
+                checkpoint.reviews += len(reviews)
+                await checkpoint_store.save(checkpoint)
+
+        async with httpx.AsyncClient() as client:
+            dispatcher = sentiment_dispatcher(client)
+            async with review_stages(dispatcher, app_id, country) as (analyze, store):
+                pipeline = ReviewPipeline(
+                    analyze,
+                    store,
+                    on_committed,
+                    queue_size=queue_size,
+                    analyze_concurrency=analyze_concurrency,
+                    store_concurrency=store_concurrency,
                 )
-                print(response.json())
-            logging.info(f"Fetched {len(reviews)} reviews. Token: {token}")
-            success = await store_reviews_async_way(
-                reviews, app_id, country, latest_review_ids
-            )
-            if not success:
-                logging.info("Reviews are loaded in DB")
-            else:
-                logging.info("Some reviews already exist, skipping")
+                stats = await pipeline.run(pages())
+            sent = await close_dispatcher(dispatcher, app_id, country)
+        if task_ids is not None:
+            task_ids.extend(sent)
+        logging.info(
+            f"Loaded {stats.reviews} reviews of {app_id} ({country}) in "
+            f"{stats.pages} pages, {stats.wall:.1f}s; stage busy time "
+            + ", ".join(f"{name} {busy:.1f}s" for name, busy in stats.busy.items())
+        )
+        if checkpoint_store is not None:
+            await checkpoint_store.clear(app_id, country)
+        if newest is not None and newest is not watermark:
+            await save_watermark(get_async_session, app_id, country, newest)
     except Exception as e:
         logging.exception(f"Error while loading reviews, {e}")
         return False
     return True
 
 
-async def load_data(app_id, lang="en", country="us"):
-    with Session(engine) as session:
-        success = load_app_details(session, app_id, lang, country)
-        reviews_success = await load_app_reviews(app_id, lang, country, session)
-        if success and reviews_success:
-            logging.info("Successfully loaded app details and reviews")
-            return True
-        else:
-            logging.info("Failed to load app details and reviews")
-            return False
+async def backfill_app_reviews_sharded(
+    app_id,
+    lang,
+    country,
+    scores=SCORE_SHARDS,
+    devices=(None,),
+    concurrency: Optional[int] = None,
+):
+    """Full-history load of one large app as parallel score x device chains.
+
+    Shards are not checkpointed; a failed shard is reported and the load
+    returns False so it can be rerun, stored reviews are skipped on rerun.
+    """
+
+    async def on_page(shard, reviews, token):
+        if reviews:
+            await process_review_page(dispatcher, reviews, token, app_id, country)
 
+    crawler = ReviewCrawler(max_concurrency=concurrency or len(scores) * len(devices))
+    async with httpx.AsyncClient() as client:
+        dispatcher = sentiment_dispatcher(client)
+        results = await crawler.crawl_sharded(
+            CrawlJob(app_id, lang, country),
+            scores,
+            devices,
+            on_page=on_page,
+            concurrency=concurrency,
+        )
+        await close_dispatcher(dispatcher, app_id, country)
+    failed = [progress for progress in results if not progress.done]
+    for progress in failed:
+        logging.error(
+            f"Shard score={progress.job.filter_score_with} "
+            f"device={progress.job.filter_device_with} failed: {progress.error}"
+        )
+    return not failed
 
-# if __name__ == "__main__":
-#     result = asyncio.run(load_data("com.flyersoft.moonreader"))
-#     print(result)
+
+async def load_data(
+    app_id,
+    lang="en",
+    country="us",
+    resume: bool = False,
+    checkpoint_store: Optional[CheckpointStore] = None,
+    incremental: bool = False,
+    task_ids: Optional[List[str]] = None,
+    on_page: Optional[Callable[[int], None]] = None,
+):
+    try:
+        await create_tables()
+    except (SQLAlchemyError, OSError) as e:
+        if not REVIEW_SPOOL_DIR:
+            raise
+        # the spool drainer creates them once the database is back
+        logging.warning(f"Could not create tables: {getattr(e, 'orig', e)}")
+    if checkpoint_store is None and REVIEW_SPOOL_DIR:
+        # spooled pages are on local disk, so is the position after them
+        checkpoint_store = FileCheckpointStore(Path(REVIEW_SPOOL_DIR) / "checkpoints")
+    elif checkpoint_store is None:
+        checkpoint_store = DatabaseCheckpointStore(get_async_session)
+    success = await load_app_details(app_id, lang, country)
+    reviews_success = await load_app_reviews(
+        app_id,
+        lang,
+        country,
+        checkpoint_store,
+        resume,
+        incremental,
+        task_ids=task_ids,
+        on_page=on_page,
+    )
+    if success and reviews_success:
+        logging.info("Successfully loaded app details and reviews")
+        return True
+    else:
+        logging.info("Failed to load app details and reviews")
+        return False
@@ -0,0 +1,352 @@
+"""Append-only local spool of crawled review pages, and its drainer.
+
+    python -m Spiders.load.spool SPOOL_DIR [--once] [--interval 5]
+
+replays every spool under SPOOL_DIR into the database, e.g. after the loader
+exited while Postgres was down, and sends the reviews to the sentiment
+service. Spools in use by a running loader are skipped. Reviews reference
+their app's ``app_information`` row, so the spool of an app whose details
+were never stored drains on its next load.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, List, Optional, Union
+
+import httpx
+
+from Spiders.load.database import (create_tables, dispose_engine,
+                                   get_async_session, transaction)
+from Spiders.load.review_writer import ReviewWriter, WriteResult
+from Spiders.load.sentiment_dispatcher import dispatcher_from_env
+from Spiders.PlayStoreScraper.review_decoder import ReviewRecord
+from Spiders.PlayStoreScraper.throttle import backoff_delay
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# every record is its zlib-compressed JSON prefixed by length and CRC-32
+_FRAME = struct.Struct(">II")
+_DATETIME_FIELDS = ("at", "replied_at")
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+
+@dataclass
+class SpoolPage:
+    app_id: str
+    country: str
+    reviews: List[ReviewRecord]
+
+
+def spool_name(app_id: str, country: str) -> str:
+    return _UNSAFE.sub("_", f"{app_id}__{country}")
+
+
+def _encode(page: SpoolPage) -> bytes:
+    reviews = []
+    for review in page.reviews:
+        values = {attr: getattr(review, attr) for attr in ReviewRecord.__slots__}
+        for attr in _DATETIME_FIELDS:
+            if values[attr] is not None:
+                values[attr] = values[attr].isoformat()
+        reviews.append(list(values.values()))
+    return json.dumps(
+        {"app_id": page.app_id, "country": page.country, "reviews": reviews},
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _decode(data: bytes) -> SpoolPage:
+    record = json.loads(data)
+    reviews = []
+    for values in record["reviews"]:
+        review = ReviewRecord(*values)
+        for attr in _DATETIME_FIELDS:
+            if getattr(review, attr) is not None:
+                setattr(review, attr, datetime.fromisoformat(getattr(review, attr)))
+        reviews.append(review)
+    return SpoolPage(record["app_id"], record["country"], reviews)
+
+
+def read_segment(path: Union[str, Path]) -> Iterator[SpoolPage]:
+    """The pages of a segment, up to a record torn by a crash."""
+    with open(path, "rb") as f:
+        while header := f.read(_FRAME.size):
+            if len(header) < _FRAME.size:
+                break
+            length, crc = _FRAME.unpack(header)
+            frame = f.read(length)
+            if len(frame) < length or zlib.crc32(frame) != crc:
+                logging.warning(f"Dropping a torn record at the end of {path}")
+                break
+            yield _decode(zlib.decompress(frame))
+
+
+class ReviewSpool:
+    """Write-ahead log of review pages waiting to be stored.
+
+    :meth:`append` compresses a page onto the open segment and fsyncs it, so
+    the page survives a crash once the call returns. The open segment
+    (``*.open``) is sealed into ``*.seg`` once it passes ``segment_bytes`` or
+    ``segment_seconds``, and on :meth:`close`; only sealed segments are
+    drained. A spool directory is locked by the one process using it, and
+    segments left open by a crashed process are sealed when it is reopened.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        segment_bytes: int = 8 << 20,
+        segment_seconds: float = 5.0,
+        level: int = 6,
+    ):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.level = level
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._segment = None
+        self._segment_path: Optional[Path] = None
+        self._segment_started = 0.0
+        self._sequence = 0
+
+    def open(self) -> "ReviewSpool":
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.directory / ".lock", "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(f"Spool {self.directory} is used by another process")
+        for path in self.directory.glob("*.open"):
+            path.rename(path.with_suffix(".seg"))
+        names = [path.stem for path in self.directory.glob("*.seg")]
+        self._sequence = max((int(name) for name in names), default=0)
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, app_id: str, country: str, reviews: List[ReviewRecord]):
+        frame = zlib.compress(_encode(SpoolPage(app_id, country, reviews)), self.level)
+        with self._lock:
+            if self._segment is None:
+                self._sequence += 1
+                self._segment_path = self.directory / f"{self._sequence:010d}.open"
+                self._segment = open(self._segment_path, "ab")
+                self._segment_started = time.monotonic()
+            self._segment.write(_FRAME.pack(len(frame), zlib.crc32(frame)) + frame)
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            if self._segment.tell() >= self.segment_bytes:
+                self._seal()
+        self.seal_stale()
+
+    def _seal(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment_path.rename(self._segment_path.with_suffix(".seg"))
+            self._segment = self._segment_path = None
+
+    def seal(self):
+        with self._lock:
+            self._seal()
+
+    def seal_stale(self):
+        """Seal the open segment once it is ``segment_seconds`` old."""
+        with self._lock:
+            if (
+                self._segment is not None
+                and time.monotonic() - self._segment_started >= self.segment_seconds
+            ):
+                self._seal()
+
+    def sealed(self) -> List[Path]:
+        return sorted(self.directory.glob("*.seg"))
+
+    def close(self):
+        self.seal()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class SpoolDrainer:
+    """Replays sealed spool segments into ``app_reviews``, oldest first.
+
+    Each segment is written in one transaction, grouped by app so the writer
+    sees up to ``batch_rows`` reviews at a time; once committed,
+    ``on_written`` is called for every batch and the segment is deleted. A
+    segment that fails, in the database or in ``on_written``, stays on disk
+    and is retried; replaying a segment twice is harmless since the writer
+    skips stored reviews and ``on_written`` sees them again. The tables are
+    created on the first drain that reaches the database.
+    """
+
+    def __init__(
+        self,
+        spool: ReviewSpool,
+        writer: ReviewWriter,
+        on_written: Optional[
+            Callable[[str, str, List[ReviewRecord], WriteResult], Awaitable]
+        ] = None,
+        batch_rows: int = 5000,
+        interval: float = 1.0,
+        retry_delay: float = 1.0,
+        max_backoff: float = 60.0,
+        final_attempts: int = 3,
+    ):
+        self.spool = spool
+        self.writer = writer
+        self.on_written = on_written
+        self.batch_rows = batch_rows
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.final_attempts = final_attempts
+        self.pages = 0
+        self.reviews = 0
+
+    async def drain_segment(self, path: Path) -> int:
+        pages = await asyncio.to_thread(lambda: list(read_segment(path)))
+        by_app = {}
+        for page in pages:
+            by_app.setdefault((page.app_id, page.country), []).extend(page.reviews)
+        written = []
+        async with transaction() as session:
+            for (app_id, country), reviews in by_app.items():
+                for start in range(0, len(reviews), self.batch_rows):
+                    batch = reviews[start : start + self.batch_rows]
+                    result = await self.writer.write(session, batch, app_id, country)
+                    written.append((app_id, country, batch, result))
+        for app_id, country, batch, result in written:
+            logging.info(
+                f"Drained {result.inserted} new and {result.updated} edited of "
+                f"{result.rows} reviews of {app_id} ({country}) from {path.name}"
+            )
+            if self.on_written is not None:
+                await self.on_written(app_id, country, batch, result)
+        path.unlink()
+        self.pages += len(pages)
+        self.reviews += sum(len(page.reviews) for page in pages)
+        return len(pages)
+
+    async def drain_once(self) -> int:
+        await asyncio.to_thread(self.spool.seal_stale)
+        drained = 0
+        for path in self.spool.sealed():
+            await create_tables()
+            drained += await self.drain_segment(path)
+        return drained
+
+    async def run(self, stop: asyncio.Event):
+        """Drain until ``stop`` is set, then empty the spool and return.
+
+        Failures are retried with back-off; once stopping, the last error is
+        raised after ``final_attempts`` and the segments stay for a later run.
+        """
+        failures = 0
+        while True:
+            stopping = stop.is_set()
+            try:
+                await self.drain_once()
+            except Exception as e:
+                failures += 1
+                if stopping and failures >= self.final_attempts:
+                    raise
+                delay = backoff_delay(failures, self.retry_delay, self.max_backoff)
+                logging.warning(f"Spool drain failed, retry in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            if stopping:
+                return
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), self.interval)
+
+
+async def drain_directory(
+    root: Union[str, Path], writer: ReviewWriter, on_written: Optional[Callable] = None
+) -> int:
+    """Drain every spool under ``root`` that no loader holds; pages drained."""
+    drained = 0
+    for directory in sorted(path.parent for path in Path(root).glob("*/.lock")):
+        spool = ReviewSpool(directory)
+        try:
+            spool.open()
+        except RuntimeError as e:
+            logging.info(f"Skipping, {e}")
+            continue
+        try:
+            drained += await SpoolDrainer(spool, writer, on_written).drain_once()
+        except Exception as e:
+            # one app's spool must not hold up the others
+            logging.error(f"Draining {directory} failed: {getattr(e, 'orig', e)}")
+        finally:
+            spool.close()
+    return drained
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("directory", help="REVIEW_SPOOL_DIR of the loader")
+    parser.add_argument("--once", action="store_true", help="drain and exit")
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--method", default=os.getenv("REVIEW_WRITE_METHOD", "auto"))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    async def drain():
+        writer = ReviewWriter(args.method)
+        async with httpx.AsyncClient() as client:
+            # drained reviews are sent for analysis like those of a load
+            dispatcher = dispatcher_from_env(client, get_async_session)
+            try:
+                while True:
+                    drained = await drain_directory(
+                        args.directory, writer, dispatcher.written
+                    )
+                    logging.info(f"Drained {drained} pages")
+                    if args.once:
+                        break
+                    await asyncio.sleep(args.interval)
+            finally:
+                try:
+                    task_ids = await dispatcher.close()
+                    logging.info(
+                        f"Sent {dispatcher.sent} drained reviews for analysis in "
+                        f"{len(task_ids)} tasks, {dispatcher.rescored} edited: "
+                        f"{', '.join(task_ids)}"
+                    )
+                finally:
+                    await dispose_engine()
+
+    asyncio.run(drain())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, select
+
+from Spiders.models.spider_models.models import (AppReviewsModel,
+                                                 CrawlWatermarkModel)
+from Spiders.PlayStoreScraper.review_decoder import ReviewRecord
+
+
+@dataclass
+class Watermark:
+    review_at: datetime
+    review_id: UUID
+
+    def is_newer(self, review_at: datetime, review_id: UUID) -> bool:
+        return review_at > self.review_at or (
+            review_at == self.review_at and review_id != self.review_id
+        )
+
+
+def newest_review(
+    reviews: Iterable[ReviewRecord], current: Optional[Watermark] = None
+):
+    """The newest (``at``, ``review_id``) of ``reviews`` and ``current``."""
+    newest = current
+    for review in reviews:
+        review_at = review.at
+        if review_at is None:
+            continue
+        if newest is None or review_at > newest.review_at:
+            newest = Watermark(review_at, UUID(review.review_id))
+    return newest
+
+
+def page_is_older(
+    reviews: Iterable[ReviewRecord], watermark: Optional[Watermark]
+) -> bool:
+    """True when no review of a NEWEST-sorted page is past ``watermark``."""
+    if watermark is None:
+        return False
+    return not any(
+        watermark.is_newer(review.at, UUID(review.review_id))
+        for review in reviews
+        if review.at is not None
+    )
+
+
+async def load_watermark(
+    session_factory: Callable, app_id: str, country: str
+) -> Optional[Watermark]:
+    """The stored watermark, else one derived from the newest stored review."""
+    async with session_factory() as session:
+        row = (
+            await session.execute(
+                select(
+                    CrawlWatermarkModel.newest_review_at,
+                    CrawlWatermarkModel.newest_review_id,
+                ).where(
+                    and_(
+                        CrawlWatermarkModel.app_id == app_id,
+                        CrawlWatermarkModel.app_country == country,
+                    )
+                )
+            )
+        ).first()
+        if row is None:
+            row = (
+                await session.execute(
+                    select(AppReviewsModel.review_created_at, AppReviewsModel.review_id)
+                    .where(
+                        and_(
+                            AppReviewsModel.app_id == app_id,
+                            AppReviewsModel.app_country == country,
+                        )
+                    )
+                    .order_by(AppReviewsModel.review_created_at.desc())
+                    .limit(1)
+                )
+            ).first()
+    if row is None:
+        return None
+    return Watermark(row[0], row[1])
+
+
+async def save_watermark(
+    session_factory: Callable, app_id: str, country: str, watermark: Watermark
+):
+    async with session_factory() as session:
+        await session.merge(
+            CrawlWatermarkModel(
+                app_id=app_id,
+                app_country=country,
+                newest_review_at=watermark.review_at,
+                newest_review_id=watermark.review_id,
+            )
+        )
+        await session.commit()
@@ -59,6 +59,8 @@ class AppReviewsModel(BaseModel):
     )
     user_name: Mapped[str] = mapped_column(String(255), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=True)
+    # hash of the normalised content, shared by reviews with the same text
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True, index=True)
     ratings: Mapped[str] = mapped_column(Integer, nullable=False)
     review_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     thumbs_up_count: Mapped[Integer] = mapped_column(Integer, nullable=False, default=0)
@@ -69,6 +71,10 @@ class AppReviewsModel(BaseModel):
     added_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True), default=func.now()
     )
+    # last time an edit by the author was written
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True
+    )
     app_info: Mapped["AppInfoModel"] = relationship(back_populates="reviews")
 
 
@@ -98,6 +104,11 @@ class AppDetailsModel(BaseModel):
     added_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True), default=func.now()
     )
+    # hash of the snapshot's values, an unchanged snapshot only bumps last_seen_at
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    last_seen_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=func.now(), nullable=True
+    )
     app_info: Mapped["AppInfoModel"] = relationship(back_populates="details")
 
 
@@ -119,6 +130,10 @@ class AppRatingsHistogramModel(BaseModel):
     added_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True), default=func.now()
     )
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    last_seen_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=func.now(), nullable=True
+    )
     app_info: Mapped["AppInfoModel"] = relationship(back_populates="ratings_histogram")
 
 
@@ -144,6 +159,40 @@ class AppDeveloperDetailsModel(BaseModel):
         TIMESTAMP(timezone=True),
         default=func.now(),
     )
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    last_seen_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=func.now(), nullable=True
+    )
     app_info: Mapped["AppInfoModel"] = relationship(
         back_populates="app_developer_details"
     )
+
+
+class CrawlCheckpointModel(BaseModel):
+    # last committed position of a review crawl, used to resume after a crash
+    __tablename__ = "crawl_checkpoints"
+    app_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    app_country: Mapped[str] = mapped_column(String(100), primary_key=True)
+    language: Mapped[str] = mapped_column(String(150), nullable=False)
+    token: Mapped[str] = mapped_column(Text, nullable=True)
+    sort: Mapped[Integer] = mapped_column(Integer, nullable=False)
+    count: Mapped[Integer] = mapped_column(Integer, nullable=False)
+    filter_score_with: Mapped[Integer] = mapped_column(Integer, nullable=True)
+    filter_device_with: Mapped[Integer] = mapped_column(Integer, nullable=True)
+    pages: Mapped[Integer] = mapped_column(Integer, nullable=False, default=0)
+    reviews: Mapped[Integer] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=func.now(), onupdate=func.now()
+    )
+
+
+class CrawlWatermarkModel(BaseModel):
+    # newest review seen for an app, incremental crawls stop once they pass it
+    __tablename__ = "crawl_watermarks"
+    app_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    app_country: Mapped[str] = mapped_column(String(100), primary_key=True)
+    newest_review_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    newest_review_id: Mapped[Uuid] = mapped_column(Uuid, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=func.now(), onupdate=func.now()
+    )
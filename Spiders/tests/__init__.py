@@ -0,0 +1,8 @@
+"""Tests of the scraper and loader, run from the repository root with
+
+    python -m pytest Spiders/tests
+    python -m unittest discover -s Spiders/tests -t .
+
+Database tests use SQLite; ``SPIDER_TEST_POSTGRES_URL`` (an asyncpg URL) also
+runs them on PostgreSQL, including the COPY write path.
+"""
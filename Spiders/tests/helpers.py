@@ -0,0 +1,32 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from Spiders.PlayStoreScraper.review_decoder import ReviewRecord
+
+APP_ID = "com.example.app"
+COUNTRY = "us"
+BASE_TIME = datetime(2024, 1, 1, 12, 0)
+
+
+def review(
+    i: int,
+    content: Optional[str] = "Good app",
+    score: int = 5,
+    reply_content: Optional[str] = None,
+) -> ReviewRecord:
+    """The ``i``-th synthetic review, a minute older than the one before."""
+    return ReviewRecord(
+        review_id=str(uuid.UUID(int=i + 1)),
+        user_name=f"User {i}",
+        content=content,
+        score=score,
+        thumbs_up_count=i,
+        review_created_version="1.0.0",
+        at=BASE_TIME - timedelta(minutes=i),
+        reply_content=reply_content,
+        replied_at=(
+            datetime(2024, 1, 2, tzinfo=timezone.utc) if reply_content else None
+        ),
+        app_version="1.0.0",
+    )
@@ -0,0 +1,40 @@
+import json
+import unittest
+
+from Spiders.benchmarks.fixtures import make_review_rows, make_reviews_body
+from Spiders.PlayStoreScraper import batchexecute
+
+
+class ParseReviewsResponseTest(unittest.TestCase):
+    def test_rows_and_token_from_str_and_bytes(self):
+        body = make_reviews_body(3, token="next")
+        for raw in (body, body.encode()):
+            rows, token = batchexecute.parse_reviews_response(raw, use_orjson=False)
+            self.assertEqual(rows, make_review_rows(3))
+            self.assertEqual(token, "next")
+
+    @unittest.skipIf(batchexecute.orjson is None, "orjson is not installed")
+    def test_orjson_matches_the_stdlib_decoder(self):
+        body = make_reviews_body(3).encode()
+        self.assertEqual(
+            batchexecute.parse_reviews_response(body, use_orjson=True),
+            batchexecute.parse_reviews_response(body, use_orjson=False),
+        )
+
+    def test_last_page_has_no_token(self):
+        rows, token = batchexecute.parse_reviews_response(make_reviews_body(1, None))
+        self.assertEqual((len(rows), token), (1, None))
+
+    def test_empty_page(self):
+        inner = json.dumps([[], None])
+        body = ")]}'\n" + json.dumps([["wrb.fr", "oCPfdb", inner]])
+        self.assertEqual(batchexecute.parse_reviews_response(body), ([], None))
+
+    def test_body_without_guard_prefix(self):
+        body = make_reviews_body(2).removeprefix(")]}'")
+        rows, _ = batchexecute.parse_reviews_response(body)
+        self.assertEqual(len(rows), 2)
+
+    def test_empty_body_is_an_error(self):
+        with self.assertRaises(ValueError):
+            batchexecute.parse_reviews_response(b")]}'\n\n")
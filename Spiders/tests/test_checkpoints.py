@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+
+from Spiders.load import database
+from Spiders.load.checkpoints import (CrawlCheckpoint, DatabaseCheckpointStore,
+                                      FileCheckpointStore)
+from Spiders.PlayStoreScraper.constants.play_store_enums import Sort
+from Spiders.PlayStoreScraper.play_store_scraper import ContinuationToken
+from Spiders.tests.helpers import APP_ID, COUNTRY
+
+
+def checkpoint(token: str = "CpEBCo4B", pages: int = 3) -> CrawlCheckpoint:
+    return CrawlCheckpoint(
+        app_id=APP_ID,
+        country=COUNTRY,
+        token=ContinuationToken(token, "en", COUNTRY, Sort.NEWEST.value, 200, 5, None),
+        pages=pages,
+        reviews=pages * 200,
+    )
+
+
+class CheckpointStoreTests:
+    """Round trips through the store of ``make_store()``."""
+
+    async def test_missing_checkpoint_loads_as_none(self):
+        self.assertIsNone(await self.store.load(APP_ID, COUNTRY))
+
+    async def test_saved_checkpoint_loads_back(self):
+        await self.store.save(checkpoint())
+        loaded = await self.store.load(APP_ID, COUNTRY)
+        self.assertEqual(loaded.token.to_dict(), checkpoint().token.to_dict())
+        self.assertEqual((loaded.pages, loaded.reviews), (3, 600))
+        self.assertIsNotNone(loaded.updated_at)
+        self.assertIsNone(await self.store.load(APP_ID, "gb"))
+
+    async def test_save_replaces_and_clear_removes(self):
+        await self.store.save(checkpoint())
+        await self.store.save(checkpoint("EgIIAQ", pages=4))
+        loaded = await self.store.load(APP_ID, COUNTRY)
+        self.assertEqual((loaded.token.token, loaded.pages), ("EgIIAQ", 4))
+        await self.store.clear(APP_ID, COUNTRY)
+        self.assertIsNone(await self.store.load(APP_ID, COUNTRY))
+
+
+class FileCheckpointStoreTest(CheckpointStoreTests, unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = FileCheckpointStore(directory.name)
+
+    async def test_unsafe_names_stay_in_the_directory(self):
+        self.assertEqual(
+            self.store._path("../com.app", "u s").parent, self.store.directory
+        )
+
+
+class DatabaseCheckpointStoreTest(
+    CheckpointStoreTests, unittest.IsolatedAsyncioTestCase
+):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database.configure_engine(f"sqlite+aiosqlite:///{directory.name}/crawl.db")
+        self.addAsyncCleanup(database.dispose_engine)
+        await database.create_tables()
+        self.store = DatabaseCheckpointStore(database.get_async_session)
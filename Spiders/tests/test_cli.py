@@ -0,0 +1,78 @@
+import io
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from Spiders.load.cli import AppTarget, Progress, load_state, parse_targets
+
+
+class ParseTargetsTest(unittest.TestCase):
+    def test_fields_default_and_duplicates_are_dropped(self):
+        lines = [
+            "# apps to load\n",
+            "com.a\n",
+            "com.b gb\n",
+            "com.c,de,\tde  # German store\n",
+            "\n",
+            "com.a us en\n",
+            "com.a gb\n",
+        ]
+        self.assertEqual(
+            parse_targets(lines, "us", "en"),
+            [
+                AppTarget("com.a", "us", "en"),
+                AppTarget("com.b", "gb", "en"),
+                AppTarget("com.c", "de", "de"),
+                AppTarget("com.a", "gb", "en"),
+            ],
+        )
+
+
+class LoadStateTest(unittest.TestCase):
+    def test_only_loaded_apps_count_as_done(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "run.state"
+            self.assertEqual(load_state(path), set())
+            path.write_text(
+                json.dumps({"app_id": "com.a", "country": "us", "lang": "en", "ok": 1})
+                + "\n"
+                + json.dumps({"app_id": "com.b", "country": "us", "lang": "en"})
+                + "\n"
+                + '{"app_id": "com.c", "coun',  # cut short by a crash
+                encoding="utf-8",
+            )
+            self.assertEqual(load_state(path), {("com.a", "us", "en")})
+        self.assertEqual(load_state(None), set())
+
+
+class TtyStream(io.StringIO):
+    def isatty(self):
+        return True
+
+
+class ProgressTest(unittest.TestCase):
+    def test_line_reports_rate_and_eta(self):
+        progress = Progress(4, io.StringIO())
+        self.assertIn("ETA -", progress.line())
+        progress.started = time.perf_counter() - 10
+        progress.done, progress.failed, progress.reviews = 2, 1, 500
+        line = progress.line()
+        self.assertTrue(line.startswith("apps 2/4 (1 failed)  reviews 500  50/s"))
+        self.assertTrue(line.endswith("ETA 0:00:10"))
+
+    def test_redrawn_in_place_on_a_terminal(self):
+        stream = TtyStream()
+        progress = Progress(1, stream)
+        progress.draw()
+        progress.draw(final=True)
+        self.assertEqual(stream.getvalue().count("\r\x1b[K"), 2)
+        self.assertEqual(stream.getvalue().count("\n"), 1)
+
+    def test_one_line_per_draw_otherwise(self):
+        stream = io.StringIO()
+        progress = Progress(1, stream)
+        progress.draw()
+        progress.draw(final=True)
+        self.assertEqual(stream.getvalue().splitlines(), [progress.line()] * 2)
@@ -0,0 +1,42 @@
+import unittest
+
+from Spiders.PlayStoreScraper.crawler import CrawlJob, ReviewCrawler
+from Spiders.tests.helpers import APP_ID, review
+
+
+class FakeReviews:
+    """One page per chain: the reviews whose index ends in the score filter."""
+
+    def aiter_pages(self, app_id, *args, filter_score_with=None, **kwargs):
+        async def pages():
+            yield [
+                review(i, score=i % 5 + 1)
+                for i in range(20)
+                if filter_score_with in (None, i % 5 + 1)
+            ], None
+
+        return pages()
+
+
+class CrawlShardedTest(unittest.IsolatedAsyncioTestCase):
+    async def crawl(self, **kwargs):
+        pages = []
+        crawler = ReviewCrawler(FakeReviews(), adaptive_page_size=False)
+        progress = await crawler.crawl_sharded(
+            CrawlJob(APP_ID),
+            on_page=lambda shard, reviews, token: pages.append(reviews),
+            **kwargs,
+        )
+        self.assertTrue(all(p.done for p in progress))
+        return [r.review_id for page in pages for r in page], len(progress)
+
+    async def test_score_shards_cover_every_review(self):
+        ids, shards = await self.crawl()
+        self.assertEqual(shards, 5)
+        self.assertEqual(sorted(ids), sorted(review(i).review_id for i in range(20)))
+
+    async def test_overlapping_shards_return_each_review_once(self):
+        for kwargs in ({"scores": (None, 1)}, {"devices": (None, 2)}):
+            ids, _ = await self.crawl(**kwargs)
+            self.assertEqual(len(ids), len(set(ids)))
+            self.assertEqual(len(ids), 20)
@@ -0,0 +1,34 @@
+import tempfile
+import unittest
+
+from sqlalchemy import inspect, text
+
+from Spiders.load import database
+
+
+class CreateTablesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database.configure_engine(f"sqlite+aiosqlite:///{directory.name}/spider.db")
+        self.addAsyncCleanup(database.dispose_engine)
+
+    async def test_column_added_to_a_model_is_created_with_its_index(self):
+        await database.create_tables()
+        async with database.get_engine().begin() as connection:
+            # app_reviews as it was before content_hash existed
+            await connection.execute(text("DROP INDEX ix_app_reviews_content_hash"))
+            await connection.execute(
+                text("ALTER TABLE app_reviews DROP COLUMN content_hash")
+            )
+        database._tables_created = False
+        await database.create_tables()
+        async with database.get_engine().connect() as connection:
+            columns, indexes = await connection.run_sync(
+                lambda sync: (
+                    inspect(sync).get_columns("app_reviews"),
+                    inspect(sync).get_indexes("app_reviews"),
+                )
+            )
+        self.assertIn("content_hash", [column["name"] for column in columns])
+        self.assertIn(["content_hash"], [index["column_names"] for index in indexes])
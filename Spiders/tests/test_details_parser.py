@@ -0,0 +1,40 @@
+import unittest
+
+from Spiders.benchmarks.bench_details_parser import extract, legacy_parse
+from Spiders.benchmarks.fixtures import make_details_html
+from Spiders.PlayStoreScraper.details_parser import (DETAIL_DS_KEYS,
+                                                     LazyDetailsDataset,
+                                                     locate_blocks)
+
+
+class LazyDetailsDatasetTest(unittest.TestCase):
+    def setUp(self):
+        self.html = make_details_html(filler_blocks=8)
+
+    def test_details_match_the_regex_parser(self):
+        lazy = extract(LazyDetailsDataset(self.html))
+        self.assertEqual(lazy, legacy_parse(self.html))
+
+    def test_only_wanted_blocks_are_located(self):
+        offsets = locate_blocks(self.html, ["ds:5", "ds:7"])
+        self.assertEqual(set(offsets), {"ds:5", "ds:7"})
+        dataset = LazyDetailsDataset(self.html)
+        self.assertEqual(set(dataset), set(DETAIL_DS_KEYS))
+        with self.assertRaises(KeyError):
+            dataset["ds:7"]
+
+    def test_blocks_are_decoded_once_and_the_page_is_dropped(self):
+        dataset = LazyDetailsDataset(self.html, ["ds:4", "ds:5"])
+        first = dataset["ds:5"]
+        self.assertIs(dataset["ds:5"], first)
+        self.assertIsNotNone(dataset._html)
+        dataset["ds:4"]
+        self.assertIsNone(dataset._html)
+
+    def test_undecodable_block_is_missing(self):
+        html = "<script>AF_initDataCallback({key: 'ds:5', data:[1, 2, });</script>"
+        dataset = LazyDetailsDataset(html, ["ds:5"])
+        self.assertEqual(list(dataset), ["ds:5"])
+        with self.assertRaises(KeyError):
+            dataset["ds:5"]
+        self.assertEqual(list(dataset), [])
@@ -0,0 +1,48 @@
+import gzip
+import tempfile
+import unittest
+
+from Spiders.PlayStoreScraper.constants.play_store_enums import CacheMode
+from Spiders.PlayStoreScraper.http_cache import CacheMiss, HttpCache
+
+URL = "https://play.google.com/store/apps/details?id=com.example.app"
+BATCH_URL = "https://play.google.com/_/PlayStoreUi/data/batchexecute"
+
+
+class HttpCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def cache(self, mode: CacheMode) -> HttpCache:
+        return HttpCache(self.directory, mode)
+
+    def test_details_mode_keeps_only_details_pages(self):
+        cache = self.cache(CacheMode.DETAILS)
+        cache.record("GET", URL, None, b"<html>", {"latency": 0.2})
+        cache.record("POST", BATCH_URL, "f.req=1", b")]}'")
+        self.assertEqual(cache.cached("GET", URL).content, b"<html>")
+        self.assertEqual(cache.cached("GET", URL).meta["latency"], 0.2)
+        self.assertIsNone(cache.lookup("POST", BATCH_URL, "f.req=1"))
+
+    def test_record_mode_keeps_review_pages_for_replay(self):
+        self.cache(CacheMode.RECORD).record("POST", BATCH_URL, "f.req=1", b")]}'")
+        replay = self.cache(CacheMode.REPLAY)
+        self.assertEqual(replay.cached("POST", BATCH_URL, "f.req=1").content, b")]}'")
+        with self.assertRaises(CacheMiss):
+            replay.cached("POST", BATCH_URL, "f.req=2")
+
+    def test_truncated_or_corrupt_entry_is_a_miss(self):
+        cache = self.cache(CacheMode.DETAILS)
+        path = cache._path(cache.key("GET", URL))
+        for damage in (
+            lambda data: data[: len(data) // 2],
+            lambda data: b"not gzip" + data,
+            lambda data: gzip.compress(b"{not json\n<html>"),
+        ):
+            cache.store("GET", URL, None, b"<html>" * 100)
+            path.write_bytes(damage(path.read_bytes()))
+            self.assertIsNone(cache.lookup("GET", URL))
+            self.assertFalse(path.exists())
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
@@ -0,0 +1,20 @@
+import unittest
+
+from Spiders.load.normalize import normalize_content, text_hash
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_trivial_differences_fold_together(self):
+        self.assertEqual(normalize_content("  Good\n\tAPP "), "good app")
+        self.assertEqual(normalize_content("Ｇｏｏｄ"), "good")
+        self.assertEqual(text_hash("Good app"), text_hash("good   APP"))
+
+    def test_punctuation_and_emoji_are_kept(self):
+        self.assertNotEqual(text_hash("Good app"), text_hash("Good app?"))
+        self.assertNotEqual(text_hash("\U0001f44d"), text_hash("\U0001f44e"))
+
+    def test_reviews_without_text_have_no_hash(self):
+        for text in (None, "", " \n "):
+            self.assertEqual(normalize_content(text), "")
+            self.assertIsNone(text_hash(text))
+
@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+
+from Spiders.load.pipeline import ReviewPipeline
+from Spiders.tests.helpers import review
+
+
+async def pages(count: int):
+    for i in range(count):
+        yield [review(i)], f"token-{i}"
+
+
+async def analyze(reviews):
+    pass
+
+
+class ReviewPipelineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_commits_in_page_order_when_stores_finish_out_of_order(self):
+        committed = []
+
+        async def store(reviews):
+            # later pages finish first
+            await asyncio.sleep(0.05 - int(reviews[0].user_name[5:]) * 0.01)
+
+        async def on_committed(seq, page):
+            committed.append((seq, page[1]))
+
+        stats = await ReviewPipeline(
+            analyze, store, on_committed, store_concurrency=3
+        ).run(pages(5))
+        self.assertEqual(committed, [(i, f"token-{i}") for i in range(5)])
+        self.assertEqual((stats.pages, stats.reviews, stats.committed_pages), (5, 5, 5))
+
+    async def test_failed_page_stops_commits_before_it(self):
+        committed = []
+
+        async def store(reviews):
+            if reviews[0].user_name == "User 2":
+                raise ConnectionError("database went away")
+
+        async def on_committed(seq, page):
+            committed.append(seq)
+
+        pipeline = ReviewPipeline(analyze, store, on_committed)
+        with self.assertRaises(ConnectionError):
+            await pipeline.run(pages(5))
+        self.assertEqual(committed, [0, 1])
+
+    async def test_failed_analysis_cancels_the_other_stages(self):
+        async def failing(reviews):
+            raise RuntimeError("sentiment service down")
+
+        async def store(reviews):
+            pass
+
+        with self.assertRaises(RuntimeError):
+            await asyncio.wait_for(
+                ReviewPipeline(failing, store, queue_size=1).run(pages(10)), 5
+            )
@@ -0,0 +1,168 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from Spiders.load.normalize import text_hash
+from Spiders.load.review_writer import REVIEW_COLUMNS, ReviewWriter, review_row
+from Spiders.models.spider_models.models import (AppInfoModel, AppReviewsModel,
+                                                 BaseModel)
+from Spiders.tests.helpers import APP_ID, COUNTRY, review
+
+# PostgreSQL database for the COPY path, e.g.
+# postgresql+asyncpg://postgres@localhost/spider_test; its tables are created
+# if missing and every test rolls back
+POSTGRES_URL = os.getenv("SPIDER_TEST_POSTGRES_URL")
+
+
+class ReviewWriterTests:
+    """Writer tests for ``method`` on the database of ``database_url()``.
+
+    Every test runs in one transaction that is rolled back afterwards.
+    """
+
+    method = "auto"
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(self.database_url())
+        async with self.engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.create_all)
+        self.connection = await self.engine.connect()
+        self.transaction = await self.connection.begin()
+        self.session = AsyncSession(bind=self.connection)
+        self.session.add(
+            AppInfoModel(
+                app_id=APP_ID,
+                country=COUNTRY,
+                language="en",
+                app_name="Example",
+                url=f"https://play.google.com/store/apps/details?id={APP_ID}",
+            )
+        )
+        await self.session.flush()
+        self.writer = ReviewWriter(self.method)
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.transaction.rollback()
+        await self.connection.close()
+        await self.engine.dispose()
+
+    async def write(self, reviews):
+        return await self.writer.write(self.session, reviews, APP_ID, COUNTRY)
+
+    async def stored(self, i: int):
+        return (
+            await self.session.execute(
+                select(
+                    AppReviewsModel.content,
+                    AppReviewsModel.content_hash,
+                    AppReviewsModel.ratings,
+                    AppReviewsModel.updated_at,
+                ).where(AppReviewsModel.review_id == uuid.UUID(review(i).review_id))
+            )
+        ).one()
+
+    async def test_inserts_new_reviews_once(self):
+        reviews = [review(i) for i in range(3)]
+        first = await self.write(reviews)
+        second = await self.write(reviews)
+        self.assertEqual((first.inserted, first.updated, first.skipped), (3, 0, 0))
+        self.assertEqual((second.inserted, second.updated, second.skipped), (0, 0, 3))
+        count = await self.session.scalar(
+            select(func.count()).where(AppReviewsModel.app_id == APP_ID)
+        )
+        self.assertEqual(count, 3)
+
+    async def test_duplicate_review_in_page_is_written_once(self):
+        result = await self.write([review(0), review(0), review(1)])
+        self.assertEqual((result.rows, result.inserted, result.skipped), (3, 2, 1))
+
+    async def test_edited_text_is_updated_and_rescored(self):
+        await self.write([review(0), review(1)])
+        result = await self.write([review(0, "Crashes since the update"), review(1)])
+        self.assertEqual((result.inserted, result.updated), (0, 1))
+        self.assertEqual(result.rescore, [review(0).review_id])
+        content, content_hash, _, updated_at = await self.stored(0)
+        self.assertEqual(content, "Crashes since the update")
+        self.assertEqual(content_hash, text_hash("Crashes since the update"))
+        self.assertIsNotNone(updated_at)
+
+    async def test_rating_and_reply_edits_are_not_rescored(self):
+        await self.write([review(0), review(1)])
+        result = await self.write(
+            [review(0, score=1), review(1, reply_content="Thanks!")]
+        )
+        self.assertEqual(result.updated, 2)
+        self.assertEqual(result.rescore, [])
+        self.assertEqual((await self.stored(0)).ratings, 1)
+
+    async def test_whitespace_and_case_edits_are_not_rescored(self):
+        await self.write([review(0, "Good app")])
+        result = await self.write([review(0, "  GOOD   app ")])
+        self.assertEqual((result.updated, result.rescore), (0, []))
+
+    async def test_legacy_row_gets_its_hash_without_rescore(self):
+        row = dict(zip(REVIEW_COLUMNS, review_row(review(0), APP_ID, COUNTRY)))
+        self.session.add(AppReviewsModel(**{**row, "content_hash": None}))
+        await self.session.flush()
+        result = await self.write([review(0)])
+        counts = (result.updated, result.backfilled, result.rescore)
+        self.assertEqual(counts, (0, 1, []))
+        stored = await self.stored(0)
+        self.assertEqual(stored.content_hash, text_hash("Good app"))
+        self.assertIsNone(stored.updated_at)
+
+    async def test_edited_legacy_row_is_updated(self):
+        row = dict(zip(REVIEW_COLUMNS, review_row(review(0), APP_ID, COUNTRY)))
+        self.session.add(AppReviewsModel(**{**row, "content_hash": None}))
+        await self.session.flush()
+        result = await self.write([review(0, score=1)])
+        counts = (result.updated, result.backfilled, result.rescore)
+        self.assertEqual(counts, (1, 0, []))
+        self.assertIsNotNone((await self.stored(0)).updated_at)
+
+
+class SQLiteWriterTests(ReviewWriterTests):
+    def database_url(self) -> str:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        return f"sqlite+aiosqlite:///{self.directory.name}/reviews.db"
+
+
+class SQLiteInsertTest(SQLiteWriterTests, unittest.IsolatedAsyncioTestCase):
+    method = "insert"
+
+    async def test_auto_picks_insert(self):
+        self.assertEqual(ReviewWriter()._method_for(self.session), "insert")
+
+
+class SQLiteOrmTest(SQLiteWriterTests, unittest.IsolatedAsyncioTestCase):
+    method = "orm"
+
+
+@unittest.skipUnless(POSTGRES_URL, "SPIDER_TEST_POSTGRES_URL is not set")
+class PostgresCopyTest(ReviewWriterTests, unittest.IsolatedAsyncioTestCase):
+    method = "copy"
+
+    def database_url(self) -> str:
+        return POSTGRES_URL
+
+    async def test_auto_picks_copy(self):
+        self.assertEqual(ReviewWriter()._method_for(self.session), "copy")
+
+    async def test_pages_of_one_transaction_are_staged_apart(self):
+        first = await self.write([review(i) for i in range(3)])
+        second = await self.write([review(i) for i in range(2, 5)])
+        self.assertEqual((first.inserted, second.inserted), (3, 2))
+
+
+@unittest.skipUnless(POSTGRES_URL, "SPIDER_TEST_POSTGRES_URL is not set")
+class PostgresInsertTest(ReviewWriterTests, unittest.IsolatedAsyncioTestCase):
+    method = "insert"
+
+    def database_url(self) -> str:
+        return POSTGRES_URL
@@ -0,0 +1,121 @@
+import json
+import tempfile
+import unittest
+from uuid import UUID
+
+import httpx
+from sqlalchemy import text
+
+from Spiders.load import database
+from Spiders.load.sentiment_dispatcher import SentimentDispatcher, review_sentiments
+from Spiders.tests.helpers import review
+
+URL = "http://sentiment.test/analysis"
+
+
+class DispatcherTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.batches = []
+        self.failures = 0
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        self.addAsyncCleanup(self.client.aclose)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.failures:
+            self.failures -= 1
+            return httpx.Response(503)
+        self.batches.append(json.loads(request.content)["reviews"])
+        return httpx.Response(200, json={"task_id": f"task-{len(self.batches)}"})
+
+    def dispatcher(self, **kwargs) -> SentimentDispatcher:
+        return SentimentDispatcher(self.client, URL, retry_delay=0, **kwargs)
+
+    def sent_users(self):
+        return [[item["review_id"][-1] for item in batch] for batch in self.batches]
+
+
+class SentimentDispatcherTest(DispatcherTestCase):
+    async def test_pages_are_coalesced_into_batches(self):
+        dispatcher = self.dispatcher(max_reviews=3)
+        await dispatcher.submit([review(0), review(1)])
+        await dispatcher.submit([review(2), review(3), review(4)])
+        self.assertEqual(await dispatcher.close(), ["task-1", "task-2"])
+        self.assertEqual(self.sent_users(), [["1", "2", "3"], ["4", "5"]])
+        self.assertEqual(dispatcher.sent, 5)
+
+    async def test_batches_stay_under_max_bytes(self):
+        dispatcher = self.dispatcher(max_bytes=600)
+        await dispatcher.submit([review(i, content="x" * 100) for i in range(4)])
+        await dispatcher.close()
+        self.assertEqual(self.sent_users(), [["1", "2"], ["3", "4"]])
+        for batch in self.batches:
+            self.assertLessEqual(len(json.dumps({"reviews": batch})), 600)
+
+    async def test_reviews_without_text_and_repeats_are_dropped(self):
+        dispatcher = self.dispatcher()
+        await dispatcher.submit([review(0), review(1, content=" "), review(2, None)])
+        await dispatcher.submit([review(0), review(3)])
+        await dispatcher.close()
+        self.assertEqual(self.sent_users(), [["1", "4"]])
+        self.assertEqual(dispatcher.filtered, 3)
+
+    async def test_only_the_last_remembered_ids_are_kept(self):
+        dispatcher = self.dispatcher(max_remembered=2)
+        await dispatcher.submit([review(0), review(1), review(2)])
+        await dispatcher.submit([review(2), review(0)])
+        await dispatcher.close()
+        self.assertEqual(self.sent_users(), [["1", "2", "3", "1"]])
+        self.assertEqual(len(dispatcher._seen), 2)
+
+    async def test_edited_reviews_are_rescored_once(self):
+        dispatcher = self.dispatcher()
+        await dispatcher.submit([review(0)])
+        await dispatcher.rescore([review(0, content="Bad app"), review(1, "Bad")])
+        await dispatcher.rescore([review(1, content="Bad")])
+        await dispatcher.close()
+        self.assertEqual(self.sent_users(), [["1", "2"]])
+        self.assertEqual(dispatcher.rescored, 1)
+
+    async def test_failed_posts_are_retried(self):
+        self.failures = 2
+        dispatcher = self.dispatcher()
+        await dispatcher.submit([review(0)])
+        self.assertEqual(await dispatcher.close(), ["task-1"])
+
+    async def test_batch_failing_every_retry_fails_the_run(self):
+        self.failures = 3
+        dispatcher = self.dispatcher(max_retries=3)
+        await dispatcher.submit([review(0)])
+        with self.assertRaises(RuntimeError):
+            await dispatcher.close()
+
+
+class ScoredFilterTest(DispatcherTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database.configure_engine(f"sqlite+aiosqlite:///{directory.name}/scores.db")
+        self.addAsyncCleanup(database.dispose_engine)
+
+    def dispatcher(self, **kwargs) -> SentimentDispatcher:
+        return super().dispatcher(session_factory=database.get_async_session, **kwargs)
+
+    async def test_scored_reviews_are_not_sent(self):
+        async with database.transaction() as session:
+            await session.execute(text("CREATE TABLE review_sentiments (review_id)"))
+            await session.execute(
+                review_sentiments.insert().values(review_id=UUID(review(1).review_id))
+            )
+        dispatcher = self.dispatcher()
+        await dispatcher.submit([review(0), review(1), review(2)])
+        await dispatcher.close()
+        self.assertEqual(self.sent_users(), [["1", "3"]])
+        self.assertEqual(dispatcher.filtered, 1)
+
+    async def test_without_the_table_everything_is_sent(self):
+        dispatcher = self.dispatcher()
+        await dispatcher.submit([review(0), review(1)])
+        await dispatcher.close()
+        self.assertEqual(self.sent_users(), [["1", "2"]])
+        self.assertIsNone(dispatcher.session_factory)
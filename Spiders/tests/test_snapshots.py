@@ -0,0 +1,16 @@
+import unittest
+
+from Spiders.load.snapshots import content_hash
+
+
+class SnapshotHashTest(unittest.TestCase):
+    def test_hash_ignores_key_order(self):
+        self.assertEqual(
+            content_hash([{"rating_star": 1, "ratings_count": 10}]),
+            content_hash([{"ratings_count": 10, "rating_star": 1}]),
+        )
+
+    def test_hash_follows_values(self):
+        self.assertNotEqual(
+            content_hash([{"ratings_count": 10}]), content_hash([{"ratings_count": 11}])
+        )
@@ -0,0 +1,143 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from Spiders.load import database
+from Spiders.load.review_writer import ReviewWriter
+from Spiders.load.spool import (ReviewSpool, SpoolDrainer, drain_directory,
+                                read_segment)
+from Spiders.models.spider_models.models import AppReviewsModel
+from Spiders.tests.helpers import APP_ID, COUNTRY, review
+
+
+class SpoolTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.spool = ReviewSpool(self.root / "spool").open()
+        self.addCleanup(self.spool.close)
+
+
+class ReviewSpoolTest(SpoolTestCase):
+    def test_pages_read_back_as_appended(self):
+        reviews = [review(0, reply_content="Thanks!"), review(1, content=None)]
+        self.spool.append(APP_ID, COUNTRY, reviews)
+        self.spool.seal()
+        [segment] = self.spool.sealed()
+        [page] = read_segment(segment)
+        self.assertEqual((page.app_id, page.country), (APP_ID, COUNTRY))
+        for read, written in zip(page.reviews, reviews):
+            for attr in written.__slots__:
+                self.assertEqual(getattr(read, attr), getattr(written, attr), attr)
+
+    def test_segment_is_sealed_once_large_enough(self):
+        self.spool.segment_bytes = 1
+        self.spool.append(APP_ID, COUNTRY, [review(0)])
+        self.spool.append(APP_ID, COUNTRY, [review(1)])
+        self.assertEqual(len(self.spool.sealed()), 2)
+
+    def test_torn_record_is_dropped(self):
+        self.spool.append(APP_ID, COUNTRY, [review(0)])
+        self.spool.append(APP_ID, COUNTRY, [review(1)])
+        self.spool.seal()
+        [segment] = self.spool.sealed()
+        with open(segment, "r+b") as f:
+            f.truncate(segment.stat().st_size - 3)
+        pages = list(read_segment(segment))
+        self.assertEqual([page.reviews[0].user_name for page in pages], ["User 0"])
+
+    def test_segment_left_open_is_sealed_on_reopen(self):
+        self.spool.append(APP_ID, COUNTRY, [review(0)])
+        # what a crashed loader leaves behind
+        crashed = self.root / "crashed"
+        crashed.mkdir()
+        [segment] = (self.root / "spool").glob("*.open")
+        shutil.copy(segment, crashed / segment.name)
+        with ReviewSpool(crashed) as reopened:
+            [sealed] = reopened.sealed()
+            self.assertEqual(len(list(read_segment(sealed))), 1)
+            reopened.append(APP_ID, COUNTRY, [review(1)])
+            reopened.seal()
+            self.assertEqual(len(reopened.sealed()), 2)
+
+    def test_spool_in_use_is_not_opened_twice(self):
+        with self.assertRaises(RuntimeError):
+            ReviewSpool(self.root / "spool").open()
+
+
+class FailingWriter(ReviewWriter):
+    async def write(self, session, reviews, app_id, country):
+        raise ConnectionError("database went away")
+
+
+class SpoolDrainerTest(SpoolTestCase, unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        database.configure_engine(f"sqlite+aiosqlite:///{self.root}/reviews.db")
+        self.addAsyncCleanup(database.dispose_engine)
+
+    async def count(self) -> int:
+        async with database.get_async_session() as session:
+            return await session.scalar(select(func.count(AppReviewsModel.review_id)))
+
+    async def test_segments_are_written_and_removed(self):
+        written = []
+
+        async def on_written(app_id, country, reviews, result):
+            written.append((app_id, len(reviews), result.inserted))
+
+        self.spool.append(APP_ID, COUNTRY, [review(0), review(1)])
+        self.spool.append(APP_ID, COUNTRY, [review(1), review(2)])
+        self.spool.seal()
+        drainer = SpoolDrainer(self.spool, ReviewWriter("insert"), on_written)
+        self.assertEqual(await drainer.drain_once(), 2)
+        self.assertEqual(self.spool.sealed(), [])
+        self.assertEqual(written, [(APP_ID, 4, 3)])
+        self.assertEqual(await self.count(), 3)
+
+    async def test_failed_segment_stays_for_a_later_drain(self):
+        self.spool.append(APP_ID, COUNTRY, [review(0)])
+        self.spool.seal()
+        with self.assertRaises(ConnectionError):
+            await SpoolDrainer(self.spool, FailingWriter("insert")).drain_once()
+        self.assertEqual(len(self.spool.sealed()), 1)
+        await SpoolDrainer(self.spool, ReviewWriter("insert")).drain_once()
+        self.assertEqual(await self.count(), 1)
+
+    async def test_segment_stays_until_on_written_succeeds(self):
+        calls = []
+
+        async def on_written(app_id, country, reviews, result):
+            calls.append(len(reviews))
+            if len(calls) == 1:
+                raise RuntimeError("sentiment service down")
+
+        self.spool.append(APP_ID, COUNTRY, [review(0), review(1)])
+        self.spool.seal()
+        drainer = SpoolDrainer(self.spool, ReviewWriter("insert"), on_written)
+        with self.assertRaises(RuntimeError):
+            await drainer.drain_once()
+        self.assertEqual(len(self.spool.sealed()), 1)
+        await drainer.drain_once()
+        self.assertEqual(self.spool.sealed(), [])
+        self.assertEqual(calls, [2, 2])
+        self.assertEqual(await self.count(), 2)
+
+    async def test_directory_drain_skips_spools_in_use(self):
+        written = []
+
+        async def on_written(app_id, country, reviews, result):
+            written.append(len(reviews))
+
+        self.spool.append(APP_ID, COUNTRY, [review(0)])
+        self.spool.seal()
+        with ReviewSpool(self.root / "idle") as idle:
+            idle.append(APP_ID, COUNTRY, [review(1), review(2)])
+            idle.seal()
+        writer = ReviewWriter("insert")
+        self.assertEqual(await drain_directory(self.root, writer, on_written), 1)
+        self.assertEqual(written, [2])
+        self.assertEqual(len(self.spool.sealed()), 1)
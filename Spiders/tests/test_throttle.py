@@ -0,0 +1,40 @@
+import random
+import unittest
+
+from Spiders.PlayStoreScraper.throttle import (AdaptivePageSizer, TokenBucket,
+                                               backoff_delay)
+
+
+class BackoffDelayTest(unittest.TestCase):
+    def test_delay_stays_within_the_capped_window(self):
+        rnd = random.Random(7)
+        for attempt in range(1, 12):
+            delay = backoff_delay(attempt, 1.0, cap=30.0, rnd=rnd)
+            self.assertGreaterEqual(delay, 0.0)
+            self.assertLessEqual(delay, min(30.0, 2 ** (attempt - 1)))
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_is_free_then_callers_queue(self):
+        bucket = TokenBucket(rate=10.0, capacity=2)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.01)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, delta=0.01)
+        self.assertLess(bucket.budget, 0)
+
+
+class AdaptivePageSizerTest(unittest.TestCase):
+    def test_grows_on_fast_pages_up_to_the_maximum(self):
+        sizer = AdaptivePageSizer(initial=1000, maximum=2000, step=500)
+        self.assertEqual([sizer.observe(0.1) for _ in range(3)], [1500, 2000, 2000])
+
+    def test_holds_between_half_and_full_target(self):
+        sizer = AdaptivePageSizer(initial=1000, target_latency=5.0)
+        self.assertEqual(sizer.observe(2.7), 1000)
+
+    def test_shrinks_on_slow_pages_and_halves_on_throttles(self):
+        sizer = AdaptivePageSizer(initial=1000, minimum=300, target_latency=5.0)
+        self.assertEqual(sizer.observe(6.0), 800)
+        self.assertEqual(sizer.observe(0.1, throttled=True), 400)
+        self.assertEqual(sizer.observe(0.1, throttled=True), 300)
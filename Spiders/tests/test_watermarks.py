@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from datetime import timedelta
+from uuid import UUID
+
+from Spiders.load import database
+from Spiders.load.review_writer import ReviewWriter
+from Spiders.load.watermarks import (Watermark, load_watermark, newest_review,
+                                     page_is_older, save_watermark)
+from Spiders.tests.helpers import APP_ID, BASE_TIME, COUNTRY, review
+
+
+def mark(i: int) -> Watermark:
+    newest = review(i)
+    return Watermark(newest.at, UUID(newest.review_id))
+
+
+class NewestReviewTest(unittest.TestCase):
+    def test_newest_of_the_page(self):
+        undated = review(5)
+        undated.at = None
+        self.assertEqual(newest_review([review(3), undated, review(1)]), mark(1))
+        self.assertIsNone(newest_review([undated]))
+
+    def test_current_watermark_is_kept_when_newer(self):
+        self.assertEqual(newest_review([review(3)], mark(0)), mark(0))
+        self.assertEqual(newest_review([review(0)], mark(3)), mark(0))
+
+
+class PageIsOlderTest(unittest.TestCase):
+    def test_without_watermark_nothing_is_older(self):
+        self.assertFalse(page_is_older([review(9)], None))
+
+    def test_page_at_or_before_the_watermark_is_older(self):
+        self.assertTrue(page_is_older([review(5), review(6)], mark(5)))
+        self.assertFalse(page_is_older([review(4), review(6)], mark(5)))
+
+    def test_other_review_at_the_same_time_is_newer(self):
+        same_time = review(9)
+        same_time.at = BASE_TIME - timedelta(minutes=5)
+        self.assertFalse(page_is_older([same_time], mark(5)))
+
+
+class WatermarkStoreTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        database.configure_engine(f"sqlite+aiosqlite:///{directory.name}/crawl.db")
+        self.addAsyncCleanup(database.dispose_engine)
+        await database.create_tables()
+
+    async def load(self):
+        return await load_watermark(database.get_async_session, APP_ID, COUNTRY)
+
+    async def test_falls_back_to_the_newest_stored_review(self):
+        self.assertIsNone(await self.load())
+        async with database.transaction() as session:
+            await ReviewWriter("insert").write(
+                session, [review(2), review(1), review(3)], APP_ID, COUNTRY
+            )
+        self.assertEqual(await self.load(), mark(1))
+
+    async def test_saved_watermark_wins(self):
+        await save_watermark(database.get_async_session, APP_ID, COUNTRY, mark(4))
+        self.assertEqual(await self.load(), mark(4))
+        await save_watermark(database.get_async_session, APP_ID, COUNTRY, mark(2))
+        self.assertEqual(await self.load(), mark(2))